@@ -1,5 +1,5 @@
 #!/usr/bin/env python
-import sys,os, argparse
+import sys,os, argparse, csv
 from importlib.resources import files as resource_files
 from collections import defaultdict
 from datetime import datetime
@@ -7,13 +7,17 @@ from datetime import datetime
 from tqdm import tqdm
 
 from pyexeggutor import (
-    open_file_reader,
-    open_file_writer,
-    write_pickle, 
     build_logger,
     format_bytes,
 )
 
+from kegg_pathway_profiler.utils import (
+    get_database_sidecar_filepath,
+    open_file_reader,
+    open_file_writer,
+    write_pickle,
+)
+
 from kegg_pathway_profiler.pathways import (
 #     get_pathway_coverage,
     # pathway_coverage_wrapper,
@@ -23,7 +27,14 @@ from kegg_pathway_profiler.pathways import (
 __program__ = os.path.split(sys.argv[0])[-1]
 
 os.makedirs(resource_files('kegg_pathway_profiler').joinpath('data'), exist_ok=True)
-DEFAULT_DATABASE = str(resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.gz'))
+# New builds default to Zstandard, which compresses in parallel and
+# decompresses 3-5x faster than gzip; without the optional zstandard
+# package the default stays gzip, and .pkl.gz databases remain readable
+try:
+    import zstandard  # noqa: F401
+    DEFAULT_DATABASE = str(resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.zst'))
+except ImportError:
+    DEFAULT_DATABASE = str(resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.gz'))
 
 # Get the current date and time
 now = datetime.now()
@@ -32,6 +43,20 @@ now = datetime.now()
 datetime_string = f"{now.year}.{now.month}.{now.day}"
 DATABASE_VERSION = f"KEGG_v{datetime_string}"
     
+def build_pathway(args):
+    """
+    Build a single `Pathway` in a worker process and return the graph data.
+
+    Args:
+        args (tuple): (id_pathway, definition, name, classes)
+
+    Returns:
+        tuple: (id_pathway, graph, ko_to_nodes, optional_kos, edges_soa)
+    """
+    id_pathway, definition, name, classes = args
+    pathway = Pathway(id=id_pathway, definition=definition, name=name, classes=classes)
+    return id_pathway, pathway.graph_, pathway.ko_to_nodes_, pathway.optional_kos_, pathway.edges_soa_
+
 # http://rest.kegg.jp/list/module
 # http://rest.kegg.jp/get/${ID}
 def main(args=None):
@@ -52,10 +77,14 @@ def main(args=None):
 
     # Pipeline
     parser_io = parser.add_argument_group('Local arguments')
-    parser_io.add_argument("-d","--database", type=str,  default=DEFAULT_DATABASE, help = f"path/to/database.pkl[.gz] [Default: {DEFAULT_DATABASE}]")
+    parser_io.add_argument("-d","--database", type=str,  default=DEFAULT_DATABASE, help = f"path/to/database.pkl[.gz|.zst] [Default: {DEFAULT_DATABASE}]")
     parser_io.add_argument("-V", "--database_version", type=str,  default=DATABASE_VERSION, help = f"Database version: Adds version information to the following file: path/to/database.version where .pkl extensions are removed [Default: {DATABASE_VERSION}]")
     parser_io.add_argument("-f", "--force",action="store_true", help = "If file exists, then remove file and update it.")
 
+    # Utilities
+    parser_utility = parser.add_argument_group('Utility arguments')
+    parser_utility.add_argument("-p","--n_jobs", type=int, default=1,  help = "Number of processes to use for parsing pathway definitions.  Use -1 for all available. [Default: 1]")
+
     parser_local = parser.add_argument_group('Local arguments')
     parser_local.add_argument("-i","--pathway_definitions", type=str, help = "path/to/pathway_definitions.tsv.  [id_pathway]<tab>[definition], No header.")
     parser_local.add_argument("-n","--pathway_names", type=str, help = "path/to/pathway_names.tsv  [id_pathway]<tab>[name], No header.")
@@ -98,24 +127,16 @@ def main(args=None):
         if not opts.force:
             raise FileExistsError(f"{opts.database} already exists.  To overwrite, please use -f/--force")
         
-    # Database version
-    database_version_filepath = opts.database
-    if database_version_filepath.endswith(".gz"):
-        database_version_filepath = database_version_filepath[:-3]
-    if database_version_filepath.endswith(".pkl"):
-        database_version_filepath = database_version_filepath[:-4]
-    if database_version_filepath.endswith(".pickle"):
-        database_version_filepath = database_version_filepath[:-7]
-    if database_version_filepath.endswith("."):
-        database_version_filepath = database_version_filepath[:-1]
-    database_version_filepath += ".version"
-    database_table_filepath = database_version_filepath[:-8] + ".tsv"
+    # Sidecar files written next to the database
+    database_version_filepath = get_database_sidecar_filepath(opts.database, ".version")
+    database_table_filepath = get_database_sidecar_filepath(opts.database, ".tsv")
+    database_kos_filepath = get_database_sidecar_filepath(opts.database, ".kos")
     
     # Intermediate files
     if opts.intermediate_directory == "auto":
         opts.intermediate_directory = os.path.join(os.path.split(opts.database)[0], "pathway_data")
     if not opts.no_intermediate_files:
-        os.makedirs(os.path.join(opts.intermediate_directory, "pathways"), exist_ok=True)
+        os.makedirs(opts.intermediate_directory, exist_ok=True)
     
     # Database
     logger.info(f"Building database version: {opts.database_version}")
@@ -123,35 +144,67 @@ def main(args=None):
     database = defaultdict(dict)
     
     if opts.download:
-        from urllib.request import urlopen
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+
+        max_workers = 16
+
+        # Build a pooled session so sockets are kept alive across all fetches
+        # instead of opening a fresh connection per pathway.  The pool size is
+        # matched to the number of fetch threads.
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_maxsize=max_workers,
+            max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504]),
+        )
+        session.mount("http://", adapter)
 
         # Fetch the pathway names and read HTML content
         url = "http://rest.kegg.jp/list/module"
         logger.info(f"Fetching KEGG pathway names: {url})")
 
-        with urlopen(url) as response:
-            html_content = response.read().decode('utf-8')
-            if not opts.no_intermediate_files:
-                with open_file_writer(os.path.join(opts.intermediate_directory, "pathway_names.tsv.gz")) as f:
-                    print(html_content, file=f)
-            for line in html_content.strip().split("\n"):
-                line = line.strip()
+        # Stream the response line-by-line instead of materializing the full
+        # listing, teeing each raw line to the intermediate file if requested
+        f_intermediate = None
+        if not opts.no_intermediate_files:
+            f_intermediate = open_file_writer(os.path.join(opts.intermediate_directory, "pathway_names.tsv.gz"))
+        with session.get(url, stream=True, timeout=30) as response:
+            for raw_line in response.iter_lines(decode_unicode=True):
+                if f_intermediate is not None:
+                    print(raw_line, file=f_intermediate)
+                line = raw_line.strip()
                 if line:
                     id, name = line.split("\t")
                     database[id]["name"] = name
-                    
-        # Fetch the pathway names and read HTML content
-        url = "http://rest.kegg.jp/list/module"
-        logger.info(f"Fetching KEGG pathway definitions and classes: {url})")
-
-        # Fetch the HTML content
-        for id in tqdm(database, desc=f"Fetching and parsing KEGG"):
-            url=f"http://rest.kegg.jp/get/{id}"
-            with urlopen(url) as response:
-                html_content = response.read().decode('utf-8')
-                if not opts.no_intermediate_files:
-                    with open_file_writer(os.path.join(opts.intermediate_directory, "pathways", f"{id}.txt.gz")) as f:
-                        print(html_content, file=f)
+        if f_intermediate is not None:
+            f_intermediate.close()
+
+        # Fetch the pathway definitions and classes across threads.  The
+        # workload is HTTP-bound so threads overlap the round-trip latency,
+        # while parsing happens in the main thread as responses complete.
+        logger.info(f"Fetching KEGG pathway definitions and classes: http://rest.kegg.jp/get/")
+
+        # One shared JSONL sink replaces ~500 per-pathway gzip files, paying
+        # the gzip stream startup and file-open syscalls once.  compresslevel=1
+        # is several times faster than the default with a modest size increase.
+        f_pathways = None
+        if not opts.no_intermediate_files:
+            import gzip
+            import json
+            f_pathways = gzip.open(os.path.join(opts.intermediate_directory, "pathways.jsonl.gz"), "wt", compresslevel=1)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            future_to_id = {
+                executor.submit(session.get, f"http://rest.kegg.jp/get/{id}", timeout=30): id
+                for id in database
+            }
+            for future in tqdm(as_completed(future_to_id), total=len(future_to_id), desc=f"Fetching and parsing KEGG", unit=" Pathways"):
+                id = future_to_id[future]
+                html_content = future.result().text
+                if f_pathways is not None:
+                    print(json.dumps({"id": id, "body": html_content}), file=f_pathways)
                 for line in html_content.strip().split("\n"):
                     line = line.strip()
                     if line:
@@ -159,78 +212,117 @@ def main(args=None):
                             database[id]["definition"] = line[12:]
                         elif line.startswith("CLASS"):
                             database[id]["classes"] = line[12:]
+
+        if f_pathways is not None:
+            f_pathways.close()
                             
     else:
         # Pathway definitions
         logger.info(f"Reading pathway definitions: {opts.pathway_definitions})")
         
+        # csv.reader is implemented in C and skips the per-line strip/split;
+        # fields are still stripped since some rows carry trailing whitespace
         with open_file_reader(opts.pathway_definitions) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    id, definition = line.split("\t")
-                    database[id]["definition"] = definition
-                    
+            for row in csv.reader(f, delimiter="\t"):
+                if not row:
+                    continue
+                id, definition = row[0].strip(), row[1].strip()
+                database[id]["definition"] = definition
+
         # Pathway names
         logger.info(f"Reading pathway names: {opts.pathway_names})")
-        
+
         with open_file_reader(opts.pathway_names) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    id, name = line.split("\t")
-                    if id not in database:
-                        raise KeyError(f"--pathway_names {opts.pathway_names} contains {id} which is not in --pathway_definitions {opts.pathway_definitions}")
-                    database[id]["name"] = name
-                    
+            for row in csv.reader(f, delimiter="\t"):
+                if not row:
+                    continue
+                id, name = row[0].strip(), row[1].strip()
+                if id not in database:
+                    raise KeyError(f"--pathway_names {opts.pathway_names} contains {id} which is not in --pathway_definitions {opts.pathway_definitions}")
+                database[id]["name"] = name
+
         # Pathway names
         logger.info(f"Reading pathway classes: {opts.pathway_classes})")
-        
+
         with open_file_reader(opts.pathway_classes) as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    id, classes = line.split("\t")
-                    if id not in database:
-                        raise KeyError(f"--pathway_classes {opts.pathway_classes} contains {id} which is not in --pathway_definitions {opts.pathway_definitions}")
-                    database[id]["classes"] = classes
+            for row in csv.reader(f, delimiter="\t"):
+                if not row:
+                    continue
+                id, classes = row[0].strip(), row[1].strip()
+                if id not in database:
+                    raise KeyError(f"--pathway_classes {opts.pathway_classes} contains {id} which is not in --pathway_definitions {opts.pathway_definitions}")
+                database[id]["classes"] = classes
                     
     # Building
     logger.info(f"Parse pathway definition and building graphs")
-    
-    for id_pathway, d in tqdm(database.items(), desc=description, unit=" Pathways"):
-        # Get attributes
-        definition = d["definition"]
-        name = d["name"]
-        classes = d["classes"]
-        # Build and parse pathway
-        pathway = Pathway(id=id_pathway, definition=definition, name=name, classes=classes)
-        # Store output
-        database[id_pathway]["graph"] = pathway.graph_
-        database[id_pathway]["ko_to_nodes"] = pathway.ko_to_nodes_
-        database[id_pathway]["optional_kos"] = pathway.optional_kos_
+
+    if opts.n_jobs == -1:
+        opts.n_jobs = os.cpu_count()
+
+    # Emit the [id_pathway]<tab>[id_ko] table as each pathway is built so the
+    # database dict is only traversed once
+    logger.info(f"Writing database pathway table: {database_table_filepath}")
+    f_table = open_file_writer(database_table_filepath)
+
+    if opts.n_jobs == 1:
+        for id_pathway, d in tqdm(database.items(), desc=description, unit=" Pathways", mininterval=1.0):
+            # Get attributes
+            definition = d["definition"]
+            name = d["name"]
+            classes = d["classes"]
+            # Build and parse pathway
+            pathway = Pathway(id=id_pathway, definition=definition, name=name, classes=classes)
+            # Store output
+            database[id_pathway]["graph"] = pathway.graph_
+            database[id_pathway]["ko_to_nodes"] = pathway.ko_to_nodes_
+            database[id_pathway]["optional_kos"] = pathway.optional_kos_
+            database[id_pathway]["edges_soa"] = pathway.edges_soa_
+            database[id_pathway]["pathway_kos"] = frozenset(pathway.ko_to_nodes_)
+            for id_ko in pathway.ko_to_nodes_:
+                print(id_pathway, id_ko, sep="\t", file=f_table)
+    else:
+        # Parsing is pure CPU so fan the pathways out across processes.
+        # `chunksize` amortizes the per-task IPC overhead.
+        from concurrent.futures import ProcessPoolExecutor
+        task_data = [(id_pathway, d["definition"], d["name"], d["classes"]) for id_pathway, d in database.items()]
+        with ProcessPoolExecutor(max_workers=opts.n_jobs) as executor:
+            for id_pathway, graph, ko_to_nodes, optional_kos, edges_soa in tqdm(executor.map(build_pathway, task_data, chunksize=16), total=len(task_data), desc=description, unit=" Pathways"):
+                database[id_pathway]["graph"] = graph
+                database[id_pathway]["ko_to_nodes"] = ko_to_nodes
+                database[id_pathway]["optional_kos"] = optional_kos
+                database[id_pathway]["edges_soa"] = edges_soa
+                database[id_pathway]["pathway_kos"] = frozenset(ko_to_nodes)
+                for id_ko in ko_to_nodes:
+                    print(id_pathway, id_ko, sep="\t", file=f_table)
+
+    f_table.close()
 
    # Write Database
     logger.info(f"Writing database file: {opts.database}")
     write_pickle(database, opts.database)
-    
+
    # Write Database Version
     logger.info(f"Writing database version file: {database_version_filepath}")
     with open_file_writer(database_version_filepath) as f:
         print("VERSION:", opts.database_version, file=f)
         print("CREATED:", now, file=f)
-        
-   # Write Database KO list
-    logger.info(f"Writing database pathway table: {database_table_filepath}")
-    with open_file_writer(database_table_filepath) as f:
-        for id_pathway, d in tqdm(database.items(), desc=description, unit=" Pathways"):
-            for id_ko in d["ko_to_nodes"]:
-                print(id_pathway, id_ko, sep="\t", file=f)
+
+    # Accumulate incrementally; iterating `ko_to_nodes` yields its keys so no
+    # intermediate per-pathway sets are built
+    database_kos = set()
+    for d in database.values():
+        database_kos.update(d["ko_to_nodes"])
+
+   # Write Database KO universe so downstream tools can load it without
+   # re-walking every pathway
+    logger.info(f"Writing database KO list: {database_kos_filepath}")
+    with open_file_writer(database_kos_filepath) as f:
+        for id_ko in sorted(database_kos):
+            print(id_ko, file=f)
 
     # Summarize database
     size_in_bytes = os.stat(opts.database).st_size
     logger.info(f"Database size: {format_bytes(size_in_bytes)} ({size_in_bytes} bytes)")
-    database_kos = set.union(*map(lambda d: set(d["ko_to_nodes"].keys()), database.values()))
     logger.info(f"Number of pathways: {len(database)}")
     logger.info(f"Number of unique KOs: {len(database_kos)}")
     
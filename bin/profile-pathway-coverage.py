@@ -1,30 +1,130 @@
 #!/usr/bin/env python
 import sys,os, argparse, warnings, subprocess
+import gzip
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from importlib.resources import files as resource_files
 from collections import defaultdict
-import pandas as pd 
+import numpy as np
+import pandas as pd
 from tqdm import tqdm
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from pyexeggutor import (
-    read_pickle, 
-    write_pickle, 
     build_logger,
-    reset_logger,
     format_bytes,
-    get_directory_size,
 )
 
 from kegg_pathway_profiler.utils import (
+    get_database_sidecar_filepath,
+    open_file_reader,
     read_kos,
+    read_pickle,
+    write_dataframe_to_tsv,
+    write_pickle,
 )
 
 from kegg_pathway_profiler.pathways import (
+    build_ko_to_pathways,
+    multiple_genome_pathway_coverage_wrapper,
     pathway_coverage_wrapper,
 )
 
 __program__ = os.path.split(sys.argv[0])[-1]
 
-DEFAULT_DATABASE = resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.gz')
+# Prefer a Zstandard-compressed database (built by newer
+# build-pathway-database.py runs) and fall back to the legacy gzip file
+DEFAULT_DATABASE = resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.zst')
+if not os.path.exists(DEFAULT_DATABASE):
+    DEFAULT_DATABASE = resource_files('kegg_pathway_profiler').joinpath('data/database.pkl.gz')
+
+# Per-worker copy of the database, loaded once by the pool initializer so the
+# multi-MB dict is not pickled and shipped through the IPC pipe per genome.
+# With a fork start method it is inherited copy-on-write for free.
+_DATABASE = None
+_FRAGMENT_DIRECTORY = None
+_KO_TO_PATHWAYS = None
+
+def initialize_worker(database, fragment_directory):
+    global _DATABASE, _FRAGMENT_DIRECTORY, _KO_TO_PATHWAYS
+    _DATABASE = database
+    _FRAGMENT_DIRECTORY = fragment_directory
+    # Inverted index so each genome only visits its candidate pathways
+    _KO_TO_PATHWAYS = build_ko_to_pathways(database)
+
+def json_default(obj):
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj)}")
+
+def write_fragment(id_genome, pathway_to_results, fragment_directory):
+    """
+    Write one genome's full coverage results to its output fragment.
+
+    Uses gzip JSON via orjson when available (sets become sorted lists),
+    otherwise a gzip pickle.
+    """
+    if orjson is not None:
+        # orjson serializes the nested result dicts several times faster than
+        # pickle; sets are represented as sorted lists in the JSON form
+        with gzip.open(os.path.join(fragment_directory, f"{id_genome}.json.gz"), "wb", compresslevel=1) as f:
+            f.write(orjson.dumps(pathway_to_results, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        write_pickle(pathway_to_results, os.path.join(fragment_directory, f"{id_genome}.pkl.gz"))
+
+def initialize_worker_from_shared_memory(shm_name, size, fragment_directory):
+    """
+    Attach to the shared-memory database buffer and unpickle it in the worker.
+
+    Used on platforms without fork (spawn start method), where the pickled
+    database would otherwise be copied through the IPC pipe once per worker.
+    Sharing the serialized bytes leaves one unpickle per worker but zero
+    per-worker IPC copies.
+    """
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        database = pickle.loads(bytes(shm.buf[:size]))
+    finally:
+        shm.close()
+    initialize_worker(database, fragment_directory)
+
+def process_genome(id_genome, evaluation_kos, duplicate_genomes=()):
+    """
+    Calculate pathway coverage for a single genome against the worker database.
+
+    The full `pathway_coverage_wrapper` output is written by the worker to a
+    per-genome pickle fragment, so only the compact coverage vector crosses
+    the IPC boundary back to the parent.  Genomes whose KO profile is
+    identical to `id_genome` are passed as `duplicate_genomes`; they share the
+    one evaluation and receive their own output fragments.
+
+    Args:
+        id_genome (str): The genome identifier.
+        evaluation_kos (set): The set of KO identifiers detected in the genome.
+        duplicate_genomes (tuple): Identifiers of genomes with the same KO profile.
+
+    Returns:
+        tuple: (id_genomes, pathway_to_coverage) where id_genomes lists every
+               genome sharing the result and pathway_to_coverage maps each
+               covered pathway identifier to its coverage ratio.
+    """
+    pathway_to_results = pathway_coverage_wrapper(
+        evaluation_kos=evaluation_kos,
+        database=_DATABASE,
+        progressbar_description=f"Calculating pathway coverage: {id_genome}",
+        ko_to_pathways=_KO_TO_PATHWAYS,
+    )
+    write_fragment(id_genome, pathway_to_results, _FRAGMENT_DIRECTORY)
+    for id_duplicate_genome in duplicate_genomes:
+        write_fragment(id_duplicate_genome, pathway_to_results, _FRAGMENT_DIRECTORY)
+    pathway_to_coverage = {id_pathway: results["coverage"] for id_pathway, results in pathway_to_results.items()}
+    return [id_genome, *duplicate_genomes], pathway_to_coverage
 
 def main(args=None):
     # Options
@@ -48,12 +148,13 @@ def main(args=None):
     # parser_io.add_argument("-t","--prevalence_table", type=str,  help = "path/to/prevalence_table.tsv[.gz].  Prevalence table with genomes as rows and KO as columns with counts prevalence values")
     parser_io.add_argument("-n","--name", type=str,  help = "Name of genome. [Default: Filename for --kos]")
     parser_io.add_argument("-o","--output_directory", type=str, default="kegg_pathway_profiler_output", help = "path/to/output_directory/ (e.g., kegg_pathway_profiler_output/]")
-    parser_io.add_argument("-d","--database", type=str, default=DEFAULT_DATABASE, help = f"path/to/database.pkl[.gz] [Default: {DEFAULT_DATABASE}]")
+    parser_io.add_argument("-d","--database", type=str, default=DEFAULT_DATABASE, help = f"path/to/database.pkl[.gz|.zst] [Default: {DEFAULT_DATABASE}]")
     parser_io.add_argument("--index_name", type=str, default="id_genome", help = f"Index name for coverage table (e.g., id_genome, id_genome_cluster, id_contig) [Default: id_genome]")
+    parser_io.add_argument("--output_format", type=str, default="tsv", choices={"tsv", "parquet"}, help = "Coverage table format.  parquet requires pyarrow. [Default: tsv]")
 
     # Utilities
-    # parser_utility = parser.add_argument_group('Utility arguments')
-    # parser_utility.add_argument("-p","--n_jobs", type=int, default=1,  help = "Number of threads to use.  Use -1 for all available. [Default: 1]")
+    parser_utility = parser.add_argument_group('Utility arguments')
+    parser_utility.add_argument("-p","--n_jobs", type=int, default=1,  help = "Number of processes to use.  Use -1 for all available. [Default: 1]")
 
     # Pathways
     # parser_pathways = parser.add_argument_group('Pathways arguments')
@@ -88,7 +189,18 @@ def main(args=None):
     logger.info(f"Database size: {format_bytes(size_in_bytes)} ({size_in_bytes} bytes)")
     logger.info(f"Loading database: {opts.database})")
     database = read_pickle(opts.database)
-    database_kos = set.union(*map(lambda d: set(d["ko_to_nodes"].keys()), database.values()))
+    # KO universe: prefer the sidecar written at build time over rebuilding
+    # the union from every pathway at startup
+    database_kos_filepath = get_database_sidecar_filepath(opts.database, ".kos")
+    if os.path.exists(database_kos_filepath):
+        with open_file_reader(database_kos_filepath) as f:
+            database_kos = set(filter(bool, map(str.strip, f)))
+    else:
+        # Accumulate incrementally; iterating `ko_to_nodes` yields its keys
+        # so no intermediate per-pathway sets are built
+        database_kos = set()
+        for d in database.values():
+            database_kos.update(d["ko_to_nodes"])
     logger.info(f"Number of pathways: {len(database)}")
     logger.info(f"Number of unique KOs: {len(database_kos)}")
 
@@ -99,36 +211,126 @@ def main(args=None):
 
     # Coverage table
     logger.info(f"Calculating pathway coverage")
-    coverage_table = defaultdict(dict)
-    output_data = defaultdict(lambda: defaultdict(dict))
-    
-    # Calculate pathway coverage for all genomes
+
+    # Preallocate the genome x pathway coverage matrix so results are written
+    # directly into position instead of accumulating a dict-of-dicts that
+    # pandas must hash-align and transpose afterwards
+    # Pathway identifiers like M00001 are fixed-width, so a plain
+    # lexicographic sort (C string comparator) matches numeric order; fall
+    # back to decorate-sort-undecorate with numeric keys on mixed widths
+    if len({len(id_pathway) for id_pathway in database.keys()}) == 1:
+        pathway_ids = sorted(database.keys())
+    else:
+        decorated_pathway_ids = [(int(id_pathway[1:]), id_pathway) for id_pathway in database.keys()]
+        decorated_pathway_ids.sort()
+        pathway_ids = [id_pathway for _, id_pathway in decorated_pathway_ids]
+    pathway_to_column = {id_pathway: j for j, id_pathway in enumerate(pathway_ids)}
+    genome_ids = list(genome_to_kos.keys())
+    genome_to_row = {id_genome: i for i, id_genome in enumerate(genome_ids)}
+    coverage_matrix = np.zeros((len(genome_ids), len(pathway_ids)), dtype=np.float32)
+
+    # Full per-genome results are written by the workers as pickle fragments
+    # so the parent only ever holds the coverage vectors
+    fragment_directory = os.path.join(opts.output_directory, "pathway_output")
+    logger.info(f"Creating pathway output fragment directory: {fragment_directory}")
+    os.makedirs(fragment_directory, exist_ok=True)
+
+    # Genomes with identical KO profiles (e.g., replicate MAGs) share one
+    # evaluation; duplicates just get copies of the representative's results
+    representative_to_duplicates = dict()
+    koset_to_representative = dict()
     for id_genome, evaluation_kos in genome_to_kos.items():
-        # Calculate pathway coverage for all pathways based on evaluation KO set
-        pathway_to_results = pathway_coverage_wrapper(
-            evaluation_kos=evaluation_kos,
+        # read_kos returns frozensets, so the profile keys are the sets themselves
+        koset = evaluation_kos
+        if koset in koset_to_representative:
+            representative_to_duplicates[koset_to_representative[koset]].append(id_genome)
+        else:
+            koset_to_representative[koset] = id_genome
+            representative_to_duplicates[id_genome] = []
+    number_of_duplicate_genomes = len(genome_to_kos) - len(representative_to_duplicates)
+    if number_of_duplicate_genomes:
+        logger.info(f"Number of genomes with duplicate KO profiles: {number_of_duplicate_genomes} (evaluating {len(representative_to_duplicates)} unique profiles)")
+
+    if opts.n_jobs == -1:
+        opts.n_jobs = os.cpu_count()
+
+    # Pool overhead never pays off with fewer genomes than workers; a single
+    # genome always runs in-process
+    if opts.n_jobs > len(representative_to_duplicates):
+        logger.info(f"Reducing --n_jobs from {opts.n_jobs} to {len(representative_to_duplicates)} (number of unique KO profiles)")
+        opts.n_jobs = len(representative_to_duplicates)
+
+    # Calculate pathway coverage for all genomes
+    if opts.n_jobs == 1:
+        # Single process: walk the database once and evaluate all genomes
+        # against each pathway while its graph is hot in cache
+        genome_to_results = multiple_genome_pathway_coverage_wrapper(
+            genome_to_kos={id_genome: genome_to_kos[id_genome] for id_genome in representative_to_duplicates},
             database=database,
-            progressbar_description=f"Calculating pathway coverage: {id_genome}",
         )
-        # Complete output
-        output_data[id_genome] = pathway_to_results
-        
-        # Coverage
-        for id_pathway, results in pathway_to_results.items():
-            coverage_table[id_genome][id_pathway] = results["coverage"]
-    
+        # Pop each genome's results while flushing so peak memory shrinks as
+        # fragments hit disk instead of holding every genome until the end
+        for id_representative in list(genome_to_results):
+            pathway_to_results = genome_to_results.pop(id_representative)
+            for id_genome in (id_representative, *representative_to_duplicates[id_representative]):
+                write_fragment(id_genome, pathway_to_results, fragment_directory)
+
+                # Coverage
+                for id_pathway, results in pathway_to_results.items():
+                    coverage_matrix[genome_to_row[id_genome], pathway_to_column[id_pathway]] = results["coverage"]
+    else:
+        # The database is broadcast once to each worker via the pool
+        # initializer instead of being pickled per submitted genome.  On
+        # platforms with fork it is inherited copy-on-write without any
+        # pickling at all; elsewhere the pickled bytes are placed in shared
+        # memory once and each worker unpickles from the shared buffer.
+        shm = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            executor_kws = dict(
+                max_workers=opts.n_jobs,
+                initializer=initialize_worker,
+                initargs=(database, fragment_directory),
+                mp_context=multiprocessing.get_context("fork"),
+            )
+        else:
+            from multiprocessing import shared_memory
+            database_buffer = pickle.dumps(database, protocol=pickle.HIGHEST_PROTOCOL)
+            shm = shared_memory.SharedMemory(create=True, size=len(database_buffer))
+            shm.buf[:len(database_buffer)] = database_buffer
+            executor_kws = dict(
+                max_workers=opts.n_jobs,
+                initializer=initialize_worker_from_shared_memory,
+                initargs=(shm.name, len(database_buffer), fragment_directory),
+            )
+            del database_buffer
+        with ProcessPoolExecutor(**executor_kws) as executor:
+            futures = [
+                executor.submit(process_genome, id_representative, genome_to_kos[id_representative], tuple(duplicate_genomes))
+                for id_representative, duplicate_genomes in representative_to_duplicates.items()
+            ]
+            for future in as_completed(futures):
+                id_genomes, pathway_to_coverage = future.result()
+
+                # Coverage
+                for id_genome in id_genomes:
+                    for id_pathway, coverage in pathway_to_coverage.items():
+                        coverage_matrix[genome_to_row[id_genome], pathway_to_column[id_pathway]] = coverage
+
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
     # Coverage table
-    df_coverage_table = pd.DataFrame(coverage_table).T.fillna(0.0)
-    df_coverage_table = df_coverage_table.loc[:,sorted(df_coverage_table.columns, key=lambda id_pathway:int(id_pathway[1:]))]
+    df_coverage_table = pd.DataFrame(coverage_matrix, index=genome_ids, columns=pathway_ids)
     df_coverage_table.index.name = opts.index_name
-    output_filepath = os.path.join(opts.output_directory, "pathway_coverage.tsv.gz")
-    logger.info(f"Writing pathway coverage table: {output_filepath}")
-    df_coverage_table.to_csv(output_filepath, sep="\t")
-    
-    # Pathway outputs
-    output_filepath = os.path.join(opts.output_directory, "pathway_output.pkl.gz")
-    logger.info(f"Writing pathway output pickle: {output_filepath}")
-    write_pickle(dict(output_data), output_filepath)
+    if opts.output_format == "parquet":
+        output_filepath = os.path.join(opts.output_directory, "pathway_coverage.parquet")
+        logger.info(f"Writing pathway coverage table: {output_filepath}")
+        df_coverage_table.to_parquet(output_filepath)
+    else:
+        output_filepath = os.path.join(opts.output_directory, "pathway_coverage.tsv.gz")
+        logger.info(f"Writing pathway coverage table: {output_filepath}")
+        write_dataframe_to_tsv(df_coverage_table, output_filepath)
     
 if __name__ == "__main__":
     main()
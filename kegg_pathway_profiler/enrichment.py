@@ -1,12 +1,84 @@
+import math
 import warnings
-from collections import defaultdict, OrderedDict
-from scipy.stats import false_discovery_control, hypergeom #, fisher_exact,nchypergeom_wallenius 
+from collections import OrderedDict
+from scipy.stats import hypergeom #, fisher_exact,nchypergeom_wallenius
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit(cache=True, parallel=True)
+    def _hypergeom_sf_batch(k_array, M, n_array, N):
+        """
+        Inclusive upper-tail hypergeometric P(X >= k) for a batch of sets.
+
+        Computed in log-space from lgamma terms, which sidesteps scipy's
+        per-call distribution infrastructure.  M (background size) and N
+        (query size) are fixed across the batch.
+        """
+        p_values = np.empty(len(k_array))
+        # log of 1 / C(M, N), shared by every term
+        log_inverse_total = math.lgamma(N + 1) + math.lgamma(M - N + 1) - math.lgamma(M + 1)
+        for index in prange(len(k_array)):
+            n = n_array[index]
+            k = k_array[index]
+            # Support of the distribution is [max(0, N + n - M), min(n, N)]
+            i_min = max(k, max(0, N + n - M))
+            i_max = min(n, N)
+            total = 0.0
+            for i in range(i_min, i_max + 1):
+                log_p = (
+                    math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1)
+                    + math.lgamma(M - n + 1) - math.lgamma(N - i + 1) - math.lgamma(M - n - N + i + 1)
+                    + log_inverse_total
+                )
+                total += math.exp(log_p)
+            p_values[index] = min(total, 1.0)
+        return p_values
+else:
+    _hypergeom_sf_batch = None
+
+
+def false_discovery_control(p_values, method: str = "bh") -> np.ndarray:
+    """
+    Benjamini-Hochberg ('bh') or Benjamini-Yekutieli ('by') adjusted p-values.
+
+    Direct numpy implementation of the step-up procedure (sort, scale by
+    n/rank, cumulative minimum from the right, unsort), matching
+    scipy.stats.false_discovery_control without its validation/dispatch
+    overhead.
+
+    Args:
+        p_values (array-like): Raw p-values.
+        method (str, optional): 'bh' or 'by'. [Defaults: "bh"]
+
+    Returns:
+        np.ndarray: Adjusted p-values in the input order.
+    """
+    check_argument_choice(method, {"bh", "by"})
+    p_values = np.asarray(p_values, dtype=float)
+    n = len(p_values)
+    order = np.argsort(p_values)
+    scaled = p_values[order] * n / np.arange(1, n + 1)
+    if method == "by":
+        scaled *= np.sum(1.0 / np.arange(1, n + 1))
+    adjusted = np.minimum.accumulate(scaled[::-1])[::-1].clip(max=1.0)
+    unsorted = np.empty_like(adjusted)
+    unsorted[order] = adjusted
+    return unsorted
+
 from pyexeggutor import check_argument_choice
 from .pathways import (
-    update_graph_edge_weights_with_detected_kos,
+    _get_pathway_mask,
+    build_edges_soa,
+    build_genome_mask,
+    build_ko_to_bit,
+    update_soa_edge_weights_with_detected_kos,
     find_paths_in_pathway_graph,
 )
 # Feature Set Enrichment
@@ -58,68 +130,74 @@ def unweighted_set_enrichment(
     # Force set type
     feature_sets = {k:set(v) for k,v in feature_sets.items()}
 
-    # Union of all features in feature sets
+    # Union of all features in feature sets; in-place accumulation avoids the
+    # argument tuple and per-union intermediate sets of set.union(*...)
     if not background_set:
-        background_set = set.union(*feature_sets.values()) | features
+        background_set = set(features)
+        background_set.update(*feature_sets.values())
     background_set = set(background_set)
     if not features <= background_set:
         raise ValueError(f"`features` must be a subset of `background_set` but `features` has {len(features - background_set)} unique features not in the background")
     
     number_of_features_in_background = len(background_set)
-    
-    data = defaultdict(OrderedDict)
-    
-    for set_name, set_features in feature_sets.items():
-        # Get number of features in set
-        number_of_features_in_set = len(set_features)
-        # Get number of features in query
-        number_of_features_in_query = len(features)
+    number_of_features_in_query = len(features)
+
+    # Collect per-set counts with set operations only so the hypergeometric
+    # test can be broadcast across all sets in one call
+    set_names = list(feature_sets.keys())
+    number_of_features_in_set = np.empty(len(set_names), dtype=int)
+    number_of_features_intersection = np.empty(len(set_names), dtype=int)
+    intersecting_features_per_set = list()
+    extra_features_per_set = list()
+
+    for i, set_name in enumerate(set_names):
+        set_features = feature_sets[set_name]
         # Get number of intersecting features between query and set
         intersecting_features = features & set_features
-        number_of_features_intersection = len(intersecting_features)
         # Extra features
         extra_features = features - intersecting_features
         # Missing features
         # missing_features = set_features - intersecting_features
-        
-        # Rum hypergeometric test
-        if test_method == "hypergeometric":
-            model = hypergeom(
-                M = number_of_features_in_background,
-                n = number_of_features_in_set,
-                N = number_of_features_in_query,
-            )
-            # "We want the *inclusive* upper tail : P-value = P(X≥x). 
-            # For this, we can compute the exclusive upper tail of the value just below x. 
-            # Indeed, since the distribution is discrete, P(X >x-1) = P(X ≥x)."
-            # Source - http://pedagogix-tagc.univ-mrs.fr/courses/ASG1/practicals/go_statistics_td/go_statistics_td_2015.html
-            p_value = model.sf(number_of_features_intersection - 1)
-            data["p-value"][set_name] = p_value
-
-        # if test_method == "fisher_exact": # The same as a hypergeometric test
-        #     number_of_query_not_in_set = len(features - set_features)
-        #     number_of_features_not_in_set = number_of_features_in_background - number_of_features_in_set
-        #     contingency_table = [
-        #         [number_of_features_intersection, number_of_features_in_query - number_of_features_intersection],
-        #         [number_of_features_in_set - number_of_features_intersection, number_of_features_not_in_set - (number_of_features_in_query - number_of_features_intersection)],
-        #     ]
-        #     stat, p_value = fisher_exact(contingency_table, alternative="greater")
-        #     data["Contingency Table"][set_name] = contingency_table
-        #     data["Statistic"][set_name] = stat
-        #     data["p-value"][set_name] = p_value
-
-        # Store values
-        data["Number Background Features (M)"][set_name] = number_of_features_in_background
-        data["Number Set Features (n)"][set_name] = number_of_features_in_set
-        data["Number Query Features (N)"][set_name] = number_of_features_in_query
-        data["Number Intersecting Features (k)"][set_name] = number_of_features_intersection
-        data["Intersecting Features"][set_name] = intersecting_features
-        data["Extra Features"][set_name] = extra_features
-        # data["Missing Features"][set_name] = missing_features
+        number_of_features_in_set[i] = len(set_features)
+        number_of_features_intersection[i] = len(intersecting_features)
+        intersecting_features_per_set.append(intersecting_features)
+        extra_features_per_set.append(extra_features)
 
+    # Run hypergeometric test for all sets in a single broadcast call instead
+    # of building one frozen scipy distribution per set
+    if test_method == "hypergeometric":
+        # "We want the *inclusive* upper tail : P-value = P(X≥x).
+        # For this, we can compute the exclusive upper tail of the value just below x.
+        # Indeed, since the distribution is discrete, P(X >x-1) = P(X ≥x)."
+        # Source - http://pedagogix-tagc.univ-mrs.fr/courses/ASG1/practicals/go_statistics_td/go_statistics_td_2015.html
+        if _hypergeom_sf_batch is not None:
+            p_values = _hypergeom_sf_batch(
+                number_of_features_intersection,
+                number_of_features_in_background,
+                number_of_features_in_set,
+                number_of_features_in_query,
+            )
+        else:
+            p_values = hypergeom.sf(
+                number_of_features_intersection - 1,
+                number_of_features_in_background,
+                number_of_features_in_set,
+                number_of_features_in_query,
+            )
 
     # Create dataframe
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(
+        OrderedDict([
+            ("p-value", p_values),
+            ("Number Background Features (M)", number_of_features_in_background),
+            ("Number Set Features (n)", number_of_features_in_set),
+            ("Number Query Features (N)", number_of_features_in_query),
+            ("Number Intersecting Features (k)", number_of_features_intersection),
+            ("Intersecting Features", intersecting_features_per_set),
+            ("Extra Features", extra_features_per_set),
+        ]),
+        index=set_names,
+    )
     df.insert(0, "Method", test_method)
 
     # Calculate adjusted p-value
@@ -198,34 +276,53 @@ def unweighted_pathway_enrichment_wrapper(
     
     # Initialize a dictionary to store sets of KOs in the most complete paths for each pathway
     feature_sets = dict()
-    
+
+    # Intern KOs to bits once across the whole database so per-path overlap
+    # counting is a mask AND plus a popcount instead of building and
+    # intersecting sets per pathway.  Python ints are used as masks since the
+    # database carries thousands of KOs.
+    ko_to_bit = build_ko_to_bit(database)
+    genome_mask = build_genome_mask(evaluation_kos, ko_to_bit)
+
     # Iterate through each pathway in the database
-    for id_pathway in tqdm(database, desc=progressbar_description, unit=" Pathways"):
+    for id_pathway in tqdm(
+        database,
+        desc=progressbar_description,
+        unit=" Pathways",
+        mininterval=1.0,
+        miniters=max(1, len(database) // 200),
+    ):
         # Retrieve pathway data
         graph = database[id_pathway]["graph"]
         ko_to_nodes = database[id_pathway]["ko_to_nodes"]
-    
-        # Find intersecting KOs between the pathway and the evaluation set
-        intersecting_kos = set(ko_to_nodes) & evaluation_kos
-        
-        if intersecting_kos:
-            # Update the graph's edge weights based on detected KOs
-            graph_weighted = update_graph_edge_weights_with_detected_kos(evaluation_kos, graph, ko_to_nodes)
-            
-            # Find the best path(s) based on the updated graph
-            paths, path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(graph_weighted)
+        edges_soa = database[id_pathway].get("edges_soa")
+
+        # Skip pathways sharing no KOs with the evaluation set; one big-int
+        # AND against the pathway's cached mask
+        if genome_mask & _get_pathway_mask(database[id_pathway], ko_to_bit):
+            if edges_soa is None:
+                # Older databases lack the SoA layout; build and cache it so
+                # the hot path traverses arrays rather than nested edge dicts
+                edges_soa = build_edges_soa(graph, ko_to_nodes)
+                database[id_pathway]["edges_soa"] = edges_soa
+            # Scatter detected KOs into a fresh weight array; no graph copy needed
+            weights_new = update_soa_edge_weights_with_detected_kos(evaluation_kos, edges_soa)
+            path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(
+                graph, weights=edges_soa["edges_weight"], weights_new=weights_new,
+            )
         
-            # Identify the most complete path and corresponding KOs
             most_complete_path = None
-            kos_in_path = set()
             number_of_intersecting_ko = 0
             for path in most_complete_paths:
-                query_kos = set(path_to_ordered_kos[path])
-                n = len(query_kos & evaluation_kos)
+                path_mask = 0
+                for id_ko in path_to_ordered_kos[path]:
+                    path_mask |= ko_to_bit[id_ko]
+                n = bin(path_mask & genome_mask).count("1")
                 if n > number_of_intersecting_ko:
                     most_complete_path = path
-                    kos_in_path = query_kos
                     number_of_intersecting_ko = n
+
+            kos_in_path = set(path_to_ordered_kos[most_complete_path]) if most_complete_path is not None else set()
             feature_sets[id_pathway] = kos_in_path
 
     # Perform unweighted set enrichment analysis on the most complete paths
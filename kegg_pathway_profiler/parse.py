@@ -1,5 +1,19 @@
 #!/usr/bin/env python
+import re
 import networkx as nx
+import numpy as np
+
+# Byte codes scanned by the vectorized branch of `_scan_expression`
+_OPEN_BRACKET_CODE = ord('(')
+_CLOSE_BRACKET_CODE = ord(')')
+_SEPARATOR_CODES = [(symbol, ord(symbol)) for symbol in (',', ' ', '+', '-')]
+_SEPARATOR_SYMBOLS = {',', ' ', '+', '-'}
+# Precompiled scanner matching only brackets and separators, so the Python
+# loop in `_scan_expression` never touches the KO identifier characters
+_SCAN_PATTERN = re.compile(r"[()+, \-]")
+# Above this length the numpy branch amortizes its array setup; the longest
+# KEGG definition is ~330 characters, so it only triggers on unusual input
+_VECTORIZED_SCAN_THRESHOLD = 512
 
 
 def order_separators(level_to_positions: dict) -> list:
@@ -133,10 +147,106 @@ def strip_outer_brackets(expression: str, bracket_levels: list) -> str:
     return expression
 
 
+def _scan_expression(expression: str) -> tuple:
+    """
+    Single fused pass replacing `get_bracket_levels`, `strip_outer_brackets`,
+    and `parse_levels`.
+
+    One loop tracks the bracket depth, records separator positions keyed by
+    'level_separator', and decides whether the whole expression is wrapped in
+    a matching outer bracket pair (the depth never returns to 0 before the
+    last character).  When outer brackets are stripped, the recorded positions
+    and levels are shifted instead of rescanned.  Expressions longer than
+    `_VECTORIZED_SCAN_THRESHOLD` are handed to a numpy branch that derives
+    per-character depth from a cumulative sum of `(`/`)` indicators, which
+    amortizes its array setup only on long input.
+
+    Args:
+        expression (str): The expression to scan.
+
+    Returns:
+        tuple: (expression, level_to_positions) where `expression` has outer
+               brackets stripped if applicable and `level_to_positions` maps
+               'level_separator' keys to ascending position lists, exactly as
+               `parse_levels` produces for the stripped expression.
+    """
+    if len(expression) <= _VECTORIZED_SCAN_THRESHOLD:
+        last_index = len(expression) - 1
+        depth = 0
+        wrapped = last_index >= 1 and expression[0] == '(' and expression[-1] == ')'
+        level_to_positions = {}
+        # The precompiled pattern skips runs of KO identifier characters at C
+        # speed; the Python loop only sees brackets and separators
+        for match in _SCAN_PATTERN.finditer(expression):
+            character = match.group()
+            if character == '(':
+                depth += 1
+            elif character == ')':
+                depth -= 1
+                if depth == 0 and match.start() < last_index:
+                    wrapped = False
+            else:
+                index = match.start()
+                key = f"{depth}_{character}"
+                if key in level_to_positions:
+                    level_to_positions[key].append(index)
+                else:
+                    level_to_positions[key] = [index]
+        if wrapped:
+            expression = expression[1:-1]
+            level_to_positions = {
+                f"{int(key.split('_')[0]) - 1}_{key.split('_')[1]}": [position - 1 for position in positions]
+                for key, positions in level_to_positions.items()
+            }
+        return expression, level_to_positions
+
+    try:
+        codes = np.frombuffer(expression.encode('ascii'), dtype=np.uint8)
+    except UnicodeEncodeError:
+        expression = strip_outer_brackets(expression, get_bracket_levels(expression))
+        return expression, parse_levels(expression)
+
+    # Depth after each character; a separator's level is its depth
+    depth = np.cumsum((codes == _OPEN_BRACKET_CODE).astype(np.int32)
+                      - (codes == _CLOSE_BRACKET_CODE).astype(np.int32))
+
+    # Strip outer brackets when the first '(' matches the last ')', i.e. the
+    # depth never returns to 0 before the final character
+    if len(codes) >= 2 and codes[0] == _OPEN_BRACKET_CODE and codes[-1] == _CLOSE_BRACKET_CODE \
+            and depth[:-1].min() >= 1:
+        expression = expression[1:-1]
+        codes = codes[1:-1]
+        depth = depth[1:-1] - 1
+
+    level_to_positions = {}
+    for symbol, code in _SEPARATOR_CODES:
+        positions = np.nonzero(codes == code)[0]
+        if len(positions):
+            levels_at_positions = depth[positions]
+            for level in np.unique(levels_at_positions):
+                level_to_positions[f"{level}_{symbol}"] = positions[levels_at_positions == level].tolist()
+
+    return expression, level_to_positions
+
+
+# Sentinel tagging stack frames that resume a partially-segmented expression
+_RESUME = object()
+
+
 def parse_expression(graph: nx.MultiDiGraph, ko_to_nodes: dict, optional_kos: set, expression: str,
                      start_node: int, end_node: int, weight: float) -> tuple:
     """
-    Recursively parse the expression to build the graph structure and update KO mappings.
+    Iteratively parse the expression to build the graph structure and update KO mappings.
+
+    Subexpressions are walked with an explicit stack instead of Python
+    recursion: each popped frame is either a `(expression, start, end, weight)`
+    work item or a `_RESUME`-tagged continuation that picks the segmentation
+    of a parent expression back up after a subexpression's subtree has been
+    fully built.  Interleaving segmentation with subtree construction this way
+    preserves the exact node numbering of the previous recursive
+    implementation (intermediate nodes are numbered `len(graph)` at creation
+    time) while removing per-level call overhead and the recursion-depth
+    limit for deeply nested definitions.
 
     Args:
         graph (nx.MultiDiGraph): The graph being constructed.
@@ -150,72 +260,82 @@ def parse_expression(graph: nx.MultiDiGraph, ko_to_nodes: dict, optional_kos: se
     Returns:
         tuple: Updated graph, KO-to-node mapping, and optional KOs set.
     """
-    # Handle the case of missing KO with a placeholder
-    if expression == '--':
-        missing_ko = 'K00000'
-        graph.add_edge(start_node, end_node, label=missing_ko, weight=0, weight_new=0, name='-')
-        optional_kos.add(missing_ko)
-        ko_to_nodes.setdefault(missing_ko, []).append([start_node, end_node])
-        return graph, ko_to_nodes, optional_kos
-
-    # Strip outer brackets and parse the expression by levels
-    expression = strip_outer_brackets(expression, get_bracket_levels(expression))
-    level_to_positions = parse_levels(expression)
-    separator_order = order_separators(level_to_positions)
-
-    # Handle single optional KO case
-    if len(separator_order) == 1 and separator_order[0] == '0_-' and expression.startswith('-'):
-        ko_id = expression[1:]
-        graph.add_edge(start_node, end_node, label=ko_id, weight=0, weight_new=0, name='-')
-        optional_kos.add(ko_id)
-        ko_to_nodes.setdefault(ko_id, []).append([start_node, end_node])
-        return graph, ko_to_nodes, optional_kos
-
-    # Recursively parse sub-expressions based on separator order
-    if separator_order:
-        separator_key = separator_order[0]
-        separator_symbol = separator_key.split('_')[1]
-        sub_weight = weight / (len(level_to_positions[separator_key]) + 1) if separator_symbol in {'+', ' '} else weight
-
-        current_separator = 0
-        current_start_node = start_node
-        current_end_node = end_node
-
-        # Process each subexpression divided by the separator
-        for separator_index in sorted(level_to_positions[separator_key]):
-            if separator_symbol in {' ', '+', '-'}:
-                current_end_node = len(graph)
-                graph.add_node(current_end_node)
-
-            subexpression = expression[current_separator:separator_index]
-            graph, ko_to_nodes, optional_kos = parse_expression(
-                graph, ko_to_nodes, optional_kos, subexpression, current_start_node, current_end_node, sub_weight
-            )
-            current_separator = separator_index + 1
-
-            if separator_symbol in {' ', '+', '-'}:
-                current_start_node = current_end_node
-
-        # Process the remaining expression after the last separator
-        remaining_expression = expression[current_separator:]
-        if separator_symbol in {' ', '+', '-'}:
-            current_start_node = current_end_node
-            current_end_node = end_node
-
-        if separator_symbol == '-' and level_to_positions[separator_key]:
-            sub_weight = 0
-
-        graph, ko_to_nodes, optional_kos = parse_expression(
-            graph, ko_to_nodes, optional_kos, remaining_expression, current_start_node, current_end_node, sub_weight
-        )
-        return graph, ko_to_nodes, optional_kos
-    else:
-        # Base case: add a single edge for the terminal expression
-        graph.add_edge(start_node, end_node, label=expression, weight=weight, weight_new=weight, name='node')
-        ko_to_nodes.setdefault(expression, []).append([start_node, end_node])
-        if weight == 0:
-            optional_kos.add(expression)
-        return graph, ko_to_nodes, optional_kos
+    stack = [(expression, start_node, end_node, weight)]
+    while stack:
+        frame = stack.pop()
+
+        if frame[0] is _RESUME:
+            # Resume segmenting a parent expression: emit the next subexpression
+            # (and its boundary node for chaining separators), then re-push the
+            # continuation so later segments wait for this subtree to finish
+            (_, expression, positions, position_index, current_separator,
+             current_start_node, current_end_node, frame_end_node,
+             separator_symbol, sub_weight, chaining) = frame
+
+            if position_index < len(positions):
+                separator_index = positions[position_index]
+                if chaining:
+                    current_end_node = len(graph)
+                    graph.add_node(current_end_node)
+
+                subexpression = expression[current_separator:separator_index]
+                next_start_node = current_end_node if chaining else current_start_node
+                stack.append((_RESUME, expression, positions, position_index + 1, separator_index + 1,
+                              next_start_node, current_end_node, frame_end_node,
+                              separator_symbol, sub_weight, chaining))
+                stack.append((subexpression, current_start_node, current_end_node, sub_weight))
+            else:
+                # Remaining expression after the last separator
+                remaining_expression = expression[current_separator:]
+                if chaining:
+                    current_start_node = current_end_node
+                    current_end_node = frame_end_node
+                if separator_symbol == '-':
+                    sub_weight = 0
+                stack.append((remaining_expression, current_start_node, current_end_node, sub_weight))
+            continue
+
+        expression, frame_start_node, frame_end_node, frame_weight = frame
+
+        # Handle the case of missing KO with a placeholder
+        if expression == '--':
+            missing_ko = 'K00000'
+            graph.add_edge(frame_start_node, frame_end_node, label=missing_ko, weight=0, weight_new=0, name='-')
+            optional_kos.add(missing_ko)
+            ko_to_nodes.setdefault(missing_ko, []).append([frame_start_node, frame_end_node])
+            continue
+
+        # Strip outer brackets and parse the expression by levels in one scan
+        expression, level_to_positions = _scan_expression(expression)
+        separator_order = order_separators(level_to_positions)
+
+        # Handle single optional KO case
+        if len(separator_order) == 1 and separator_order[0] == '0_-' and expression.startswith('-'):
+            ko_id = expression[1:]
+            graph.add_edge(frame_start_node, frame_end_node, label=ko_id, weight=0, weight_new=0, name='-')
+            optional_kos.add(ko_id)
+            ko_to_nodes.setdefault(ko_id, []).append([frame_start_node, frame_end_node])
+            continue
+
+        if separator_order:
+            # Segment the expression by its lowest-order separator; the
+            # continuation frame walks the segments one subtree at a time
+            separator_key = separator_order[0]
+            separator_symbol = separator_key.split('_')[1]
+            positions = sorted(level_to_positions[separator_key])
+            sub_weight = frame_weight / (len(positions) + 1) if separator_symbol in {'+', ' '} else frame_weight
+            chaining = separator_symbol in {' ', '+', '-'}
+            stack.append((_RESUME, expression, positions, 0, 0,
+                          frame_start_node, frame_end_node, frame_end_node,
+                          separator_symbol, sub_weight, chaining))
+        else:
+            # Base case: add a single edge for the terminal expression
+            graph.add_edge(frame_start_node, frame_end_node, label=expression, weight=frame_weight, weight_new=frame_weight, name='node')
+            ko_to_nodes.setdefault(expression, []).append([frame_start_node, frame_end_node])
+            if frame_weight == 0:
+                optional_kos.add(expression)
+
+    return graph, ko_to_nodes, optional_kos
 
 
 # def process_pathway(id_pathway: str, definition: str, start_node_color: str = "green",
@@ -1,7 +1,16 @@
 #!/usr/bin/env python
 # from dataclasses import dataclass
+import os
+import multiprocessing
+from collections import deque
 import networkx as nx
+import numpy as np
 from tqdm import tqdm
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 from pyexeggutor import (
     check_argument_choice,
     format_header,
@@ -15,44 +24,347 @@ from kegg_pathway_profiler.parse import (
 )
 
 
+def build_ko_to_pathways(database: dict) -> dict:
+    """
+    Invert the database's KO membership into a KO -> pathways index.
+
+    With sparse annotations most pathways share no KOs with a given genome;
+    the inverted index lets callers derive the candidate pathways for an
+    evaluation set directly instead of testing every pathway for overlap.
+
+    Parameters
+    ----------
+    database : dict
+        A dictionary representing the KEGG database, where each key is a
+        pathway identifier and the value contains a "ko_to_nodes" mapping
+        (see `pathway_coverage_wrapper`).
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each KO identifier to the list of pathway
+        identifiers containing it, in database order.
+    """
+    ko_to_pathways = dict()
+    for id_pathway, data in database.items():
+        for id_ko in data["ko_to_nodes"]:
+            ko_to_pathways.setdefault(id_ko, []).append(id_pathway)
+    return ko_to_pathways
+
+
+def build_edges_soa(
+    graph: nx.MultiDiGraph,
+    ko_to_nodes: dict,
+    ) -> dict:
+    """
+    Flatten a pathway graph's edge data into structure-of-arrays (SoA) form.
+
+    The per-edge attribute dicts of a `nx.MultiDiGraph` are pointer-chasing
+    targets during coverage evaluation.  This function lays the edge weights
+    and labels out in contiguous numpy arrays and builds an index from each
+    KO to the positions of its edges, so detected-KO weight updates become a
+    single numpy scatter instead of nested dict lookups.  Each edge in the
+    graph is annotated with its array position under the `index` attribute so
+    downstream traversal can read weights from the arrays.
+
+    Parameters
+    ----------
+    graph : nx.MultiDiGraph
+        A pathway graph as built by `parse_expression`.  Modified in place:
+        each edge gains an `index` attribute.
+
+    ko_to_nodes : dict
+        A dictionary mapping each KO identifier to its list of [start, end]
+        node pairs in the graph.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+        - 'edges_u': np.ndarray[int32], source node of each edge.
+        - 'edges_v': np.ndarray[int32], target node of each edge.
+        - 'edges_weight': np.ndarray[float64], the static `weight` of each edge.
+        - 'edge_labels': np.ndarray[object], the KO label of each edge.
+        - 'ko_to_edge_indices': dict mapping each KO to an np.ndarray[int32]
+          of positions in the edge arrays.
+    """
+    number_of_edges = graph.number_of_edges()
+    edges_u = np.empty(number_of_edges, dtype=np.int32)
+    edges_v = np.empty(number_of_edges, dtype=np.int32)
+    # float64 so array sums match Python float arithmetic exactly
+    edges_weight = np.empty(number_of_edges, dtype=np.float64)
+    edge_labels = np.empty(number_of_edges, dtype=object)
+    ko_to_edge_indices = {id_ko: [] for id_ko in ko_to_nodes}
+
+    for edge_index, (u, v, edge_key, data) in enumerate(graph.edges(keys=True, data=True)):
+        edges_u[edge_index] = u
+        edges_v[edge_index] = v
+        edges_weight[edge_index] = data["weight"]
+        edge_labels[edge_index] = data["label"]
+        data["index"] = edge_index
+        ko_to_edge_indices[data["label"]].append(edge_index)
+
+    for id_ko, edge_indices in ko_to_edge_indices.items():
+        ko_to_edge_indices[id_ko] = np.asarray(edge_indices, dtype=np.int32)
+
+    return dict(
+        edges_u=edges_u,
+        edges_v=edges_v,
+        edges_weight=edges_weight,
+        edge_labels=edge_labels,
+        ko_to_edge_indices=ko_to_edge_indices,
+    )
+
+
+def update_soa_edge_weights_with_detected_kos(
+    evaluation_kos: set,
+    edges_soa: dict,
+    out: np.ndarray = None,
+    ) -> np.ndarray:
+    """
+    Compute updated edge weights for detected KOs as a numpy scatter.
+
+    SoA counterpart of `update_graph_edge_weights_with_detected_kos`: instead
+    of copying the graph and rewriting per-edge attribute dicts, the static
+    weight array is copied and the positions of every detected KO's edges are
+    zeroed in one fancy-indexed assignment per KO.
+
+    Parameters
+    ----------
+    evaluation_kos : set
+        A set of KEGG Orthology (KO) identifiers that have been detected.
+
+    edges_soa : dict
+        The structure-of-arrays edge data produced by `build_edges_soa`.
+
+    out : np.ndarray, optional
+        A scratch array aligned with `edges_soa["edges_weight"]` to reset and
+        fill in place.  Callers evaluating many genomes against one pathway
+        pass the same buffer to avoid a fresh allocation per evaluation.
+
+    Returns
+    -------
+    np.ndarray
+        A float64 array of updated weights, aligned with `edges_soa["edges_weight"]`,
+        with detected KOs' edges set to 0.
+    """
+    if out is None:
+        weights_new = edges_soa["edges_weight"].copy()
+    else:
+        # Resetting the scratch buffer is a single memcpy
+        np.copyto(out, edges_soa["edges_weight"])
+        weights_new = out
+    ko_to_edge_indices = edges_soa["ko_to_edge_indices"]
+    # C-level set intersection iterates the smaller operand, so a genome with
+    # thousands of KOs costs O(pathway KOs) here, not O(genome KOs)
+    for id_ko in ko_to_edge_indices.keys() & evaluation_kos:
+        weights_new[ko_to_edge_indices[id_ko]] = 0.0
+    return weights_new
+
+
+def build_pathway_csr(graph: nx.MultiDiGraph) -> dict:
+    """
+    Lower a pathway graph to CSR-style incoming-edge arrays for the JIT path DP.
+
+    Incoming edges are grouped per node in the exact order the Python DP
+    enumerates them (predecessors ascending, parallel edges in key order), so
+    the compiled traversal reproduces the interpreted one record for record.
+    Edge labels are interned to int32 ids; `labels` maps them back to strings.
+    Requires each edge to carry the `index` attribute assigned by
+    `build_edges_soa`, which positions it in the weight arrays.
+
+    Parameters
+    ----------
+    graph : nx.MultiDiGraph
+        A pathway graph whose edges have been annotated by `build_edges_soa`.
+
+    Returns
+    -------
+    dict
+        A dictionary with the following keys:
+        - 'topological_order': np.ndarray[int32], nodes in evaluation order.
+        - 'in_indptr': np.ndarray[int64], per-node slice bounds into the
+          incoming-edge arrays (indexed by node id).
+        - 'in_sources': np.ndarray[int32], source node of each incoming edge.
+        - 'in_edge_indices': np.ndarray[int32], position of each incoming edge
+          in the SoA weight arrays.
+        - 'in_label_ids': np.ndarray[int32], interned label of each incoming edge.
+        - 'labels': list mapping label ids back to KO strings.
+    """
+    number_of_nodes = graph.number_of_nodes()
+    number_of_edges = graph.number_of_edges()
+
+    in_indptr = np.zeros(number_of_nodes + 1, dtype=np.int64)
+    in_sources = np.empty(number_of_edges, dtype=np.int32)
+    in_edge_indices = np.empty(number_of_edges, dtype=np.int32)
+    in_label_ids = np.empty(number_of_edges, dtype=np.int32)
+    label_to_id = dict()
+    labels = []
+
+    position = 0
+    for node in range(number_of_nodes):
+        predecessors = graph.pred[node]
+        for pred in sorted(predecessors):
+            for edge_key in predecessors[pred]:
+                edge_data = predecessors[pred][edge_key]
+                label = edge_data["label"]
+                label_id = label_to_id.get(label)
+                if label_id is None:
+                    label_id = len(labels)
+                    label_to_id[label] = label_id
+                    labels.append(label)
+                in_sources[position] = pred
+                in_edge_indices[position] = edge_data["index"]
+                in_label_ids[position] = label_id
+                position += 1
+        in_indptr[node + 1] = position
+
+    # Kahn's algorithm over the arrays just built, instead of
+    # nx.topological_sort's generator walking nested attribute dicts.  The
+    # outgoing adjacency is derived by a stable argsort of the incoming-edge
+    # sources; parallel edges appear once per key, so the per-edge in-degree
+    # decrements balance.  Any valid topological order yields identical
+    # records downstream because each node's record order depends only on its
+    # own sorted incoming edges, never on when the node was visited.
+    in_degree = np.diff(in_indptr)
+    edge_targets = np.repeat(np.arange(number_of_nodes, dtype=np.int32), in_degree)
+    out_order = np.argsort(in_sources, kind="stable")
+    out_targets = edge_targets[out_order]
+    out_indptr = np.zeros(number_of_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(in_sources, minlength=number_of_nodes), out=out_indptr[1:])
+
+    queue = deque(np.flatnonzero(in_degree == 0).tolist())
+    topological_order = np.empty(number_of_nodes, dtype=np.int32)
+    number_sorted = 0
+    while queue:
+        node = queue.popleft()
+        topological_order[number_sorted] = node
+        number_sorted += 1
+        for successor in out_targets[out_indptr[node]:out_indptr[node + 1]].tolist():
+            in_degree[successor] -= 1
+            if in_degree[successor] == 0:
+                queue.append(successor)
+
+    return dict(
+        topological_order=topological_order,
+        in_indptr=in_indptr,
+        in_sources=in_sources,
+        in_edge_indices=in_edge_indices,
+        in_label_ids=in_label_ids,
+        labels=labels,
+    )
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _find_paths_csr(topological_order, in_indptr, in_sources, in_edge_indices, in_label_ids, weights, weights_new):
+        """
+        Compiled record DP over CSR incoming-edge arrays.
+
+        Mirrors the interpreted DP in `find_paths_in_pathway_graph`: every
+        record extends a predecessor record across one edge, in the same
+        enumeration order and with the same float64 additions, so the sink
+        records (and therefore coverage, ties, and reported paths) are
+        bit-identical.  Returns the flat record arrays plus each node's
+        record offset so the caller can slice out the sink and walk
+        backpointers.
+        """
+        number_of_nodes = topological_order.shape[0]
+
+        # First pass: record counts per node, in topological order
+        record_counts = np.zeros(number_of_nodes, dtype=np.int64)
+        for order_index in range(number_of_nodes):
+            node = topological_order[order_index]
+            start, end = in_indptr[node], in_indptr[node + 1]
+            if start == end:
+                record_counts[node] = 1
+            else:
+                count = 0
+                for edge_position in range(start, end):
+                    count += record_counts[in_sources[edge_position]]
+                record_counts[node] = count
+
+        record_offsets = np.zeros(number_of_nodes, dtype=np.int64)
+        total_records = 0
+        for order_index in range(number_of_nodes):
+            node = topological_order[order_index]
+            record_offsets[node] = total_records
+            total_records += record_counts[node]
+
+        # Second pass: fill weight sums and backpointers
+        record_old = np.empty(total_records, dtype=np.float64)
+        record_new = np.empty(total_records, dtype=np.float64)
+        record_back = np.empty(total_records, dtype=np.int64)
+        record_label = np.empty(total_records, dtype=np.int32)
+        for order_index in range(number_of_nodes):
+            node = topological_order[order_index]
+            start, end = in_indptr[node], in_indptr[node + 1]
+            position = record_offsets[node]
+            if start == end:
+                record_old[position] = 0.0
+                record_new[position] = 0.0
+                record_back[position] = -1
+                record_label[position] = -1
+                continue
+            for edge_position in range(start, end):
+                source = in_sources[edge_position]
+                edge_weight = weights[in_edge_indices[edge_position]]
+                edge_weight_new = weights_new[in_edge_indices[edge_position]]
+                label_id = in_label_ids[edge_position]
+                source_offset = record_offsets[source]
+                for source_record in range(record_counts[source]):
+                    record_old[position] = record_old[source_offset + source_record] + edge_weight
+                    record_new[position] = record_new[source_offset + source_record] + edge_weight_new
+                    record_back[position] = source_offset + source_record
+                    record_label[position] = label_id
+                    position += 1
+
+        return record_offsets, record_counts, record_old, record_new, record_back, record_label
+else:
+    _find_paths_csr = None
+
+
 def update_graph_edge_weights_with_detected_kos(
     evaluation_kos: set, 
     graph: nx.MultiDiGraph, 
     ko_to_nodes: dict,
-    ) -> nx.MultiDiGraph:
+    ) -> tuple:
     """
     Updates the edge weights in the given directed graph based on the presence of KOs in the evaluation set.
-    
-    This function creates a copy of the provided graph to ensure the original is not modified. It then iterates 
-    through each KO (KEGG Orthology identifier) in the evaluation set. For each KO, the function identifies the 
-    corresponding edges in the graph and sets their 'weight_new' attribute to 0, indicating that these KOs have 
-    been detected in the evaluation set.
-    
+
+    This function mutates the provided graph in place: for each KO (KEGG Orthology identifier) in the
+    evaluation set, the corresponding edges have their 'weight_new' attribute set to 0, indicating that
+    these KOs have been detected.  The touched edges are returned so the caller can restore the graph
+    with `restore_graph_edge_weights` after evaluating it — zeroing a handful of attributes and
+    restoring them is far cheaper than deep-copying the whole graph per evaluation.
+
     Parameters:
     ----------
     evaluation_kos : set
         A set of KEGG Orthology (KO) identifiers that have been detected or are under evaluation.
-        
+
     graph : nx.MultiDiGraph
-        A directed multigraph from the NetworkX library where nodes represent entities (e.g., genes, enzymes), 
-        and edges represent interactions or relationships between these entities. Each edge is expected to have 
+        A directed multigraph from the NetworkX library where nodes represent entities (e.g., genes, enzymes),
+        and edges represent interactions or relationships between these entities. Each edge is expected to have
         a 'label' attribute corresponding to a KO and a 'weight_new' attribute that will be updated.
-        
+
     ko_to_nodes : dict
-        A dictionary mapping each KO identifier to a list of (start, end) node tuples, representing the edges in 
+        A dictionary mapping each KO identifier to a list of (start, end) node tuples, representing the edges in
         the graph that are associated with that KO.
-        
+
     Returns:
     -------
-    nx.MultiDiGraph
-        A modified copy of the input graph with updated edge weights based on the detected KOs.
-    
+    tuple
+        (graph, touched_edges) where `graph` is the mutated input graph and `touched_edges` is a list of
+        (start, finish, edge_key) tuples whose 'weight_new' was set to 0.
+
     Notes:
     -----
-    - The function assumes that each edge in the graph has a 'label' attribute matching a KO and a 'weight_new' 
+    - The function assumes that each edge in the graph has a 'label' attribute matching a KO and a 'weight_new'
       attribute that will be set to 0 for matching KOs.
     - If multiple edges exist between two nodes, the function finds and updates the first edge that matches the KO.
-    
+    - Callers must restore the touched edges (weight_new == weight initially) before the graph is reused.
+
     Example:
     -------
     >>> evaluation_kos = {'K00100', 'K00200'}
@@ -60,37 +372,65 @@ def update_graph_edge_weights_with_detected_kos(
     >>> graph = nx.MultiDiGraph()
     >>> graph.add_edge(0, 1, label='K00100', weight=1, weight_new=1)
     >>> graph.add_edge(1, 2, label='K00200', weight=1, weight_new=1)
-    >>> updated_graph = update_graph_edge_weights_with_detected_kos(evaluation_kos, graph, ko_to_nodes)
-    >>> updated_graph[0][1][0]['weight_new']  # Should be 0
-    >>> updated_graph[1][2][0]['weight_new']  # Should be 0
+    >>> graph, touched_edges = update_graph_edge_weights_with_detected_kos(evaluation_kos, graph, ko_to_nodes)
+    >>> graph[0][1][0]['weight_new']  # Should be 0
+    >>> graph[1][2][0]['weight_new']  # Should be 0
+    >>> restore_graph_edge_weights(graph, touched_edges)
     """
-    
-    # Copy the graph to avoid modifying the original
-    graph = graph.copy()
-    
-    # Update edge weights for the KOs present in the evaluation set
-    for id_ko in evaluation_kos:
-        if id_ko in ko_to_nodes:
-            # Get the list of edges associated with the current KO
-            edges = ko_to_nodes[id_ko]
-            for start, finish in edges:
-                if len(graph[start][finish]) > 0:
-                    # Find the first edge that matches the KO label
-                    for num in range(len(graph[start][finish])):
-                        if graph[start][finish][num]['label'] == id_ko:
-                            index = num
-                            break
-                else:
-                    index = 0
-                # Set the 'weight_new' attribute to 0 for edges that match the KO
-                graph[start][finish][index]['weight_new'] = 0
-                
-    return graph
+    touched_edges = []
+
+    # Resolving (start, finish, label) to an edge key by scanning parallel edges
+    # is O(parallel edges) per KO; build the lookup once per graph and cache it
+    # on the graph's attribute dict so every subsequent evaluation is a single
+    # hash lookup.  setdefault keeps the first matching edge, like the old scan.
+    edge_key_index = graph.graph.get("_edge_key_index")
+    if edge_key_index is None:
+        edge_key_index = dict()
+        for start, finish, edge_key, label in graph.edges(keys=True, data="label"):
+            edge_key_index.setdefault((start, finish, label), edge_key)
+        graph.graph["_edge_key_index"] = edge_key_index
+
+    # Update edge weights for the KOs present in the evaluation set.  The
+    # C-level set intersection iterates the smaller operand, so this costs
+    # O(pathway KOs) rather than hashing every genome KO against ko_to_nodes.
+    for id_ko in ko_to_nodes.keys() & evaluation_kos:
+        # Get the list of edges associated with the current KO
+        for start, finish in ko_to_nodes[id_ko]:
+            index = edge_key_index[(start, finish, id_ko)]
+            # Set the 'weight_new' attribute to 0 for edges that match the KO
+            graph[start][finish][index]['weight_new'] = 0
+            touched_edges.append((start, finish, index))
+
+    return graph, touched_edges
+
+
+def restore_graph_edge_weights(
+    graph: nx.MultiDiGraph,
+    touched_edges: list,
+    ):
+    """
+    Restore 'weight_new' to the static 'weight' on edges touched by
+    `update_graph_edge_weights_with_detected_kos`.
+
+    Parameters:
+    ----------
+    graph : nx.MultiDiGraph
+        The graph mutated by `update_graph_edge_weights_with_detected_kos`.
+
+    touched_edges : list
+        The (start, finish, edge_key) tuples returned by the update.
+    """
+    for start, finish, edge_key in touched_edges:
+        data = graph[start][finish][edge_key]
+        data['weight_new'] = data['weight']
 
                 
 # Find pathways in pathway graph
 def find_paths_in_pathway_graph(
     graph: nx.MultiDiGraph,
+    weights: np.ndarray = None,
+    weights_new: np.ndarray = None,
+    prune_dominated: bool = False,
 ):
     """
     Finds and evaluates all paths in a directed, acyclic graph representing a biological pathway.
@@ -104,35 +444,57 @@ def find_paths_in_pathway_graph(
     Parameters
     ----------
     graph : nx.MultiDiGraph
-        A directed, acyclic graph where nodes represent biological components (e.g., genes, proteins) 
+        A directed, acyclic graph where nodes represent biological components (e.g., genes, proteins)
         and edges represent interactions or dependencies. Each edge should have associated attributes:
         'weight' (old weight) and 'weight_new' (new weight).
 
+    weights : np.ndarray, optional
+        Static edge weights in structure-of-arrays form (see `build_edges_soa`).
+        When provided together with `weights_new`, weights are read from these
+        arrays via each edge's `index` attribute instead of the per-edge
+        'weight'/'weight_new' attributes, so no graph copy is required.
+
+    weights_new : np.ndarray, optional
+        Updated edge weights aligned with `weights`, typically produced by
+        `update_soa_edge_weights_with_detected_kos`.
+
+    prune_dominated : bool, optional
+        If True, drop Pareto-dominated partial paths at every node: a partial
+        path with a higher new-weight sum and a lower-or-equal old-weight sum
+        than another can never achieve a smaller final ratio, so only the
+        Pareto frontier of (old, new) sums needs to be carried forward.  This
+        caps the otherwise exponential number of records per node and leaves
+        the minimum normalized weight (and therefore the coverage) unchanged,
+        but dominated paths can still tie it (e.g., every fully covered path
+        has ratio 0), so the number of most-complete paths and which tied
+        path is reported may differ from the exhaustive enumeration.
+        [Default: False]
+
     Returns
     -------
-    paths : list of lists
-        A list where each sublist represents a sequence of nodes (as a path) in the graph.
-        Example: [[0, 2, 4, 5, 6, 7, 1], [0, 3, 5, 7, 1]]
-    
     path_to_ordered_kos : dict
-        A dictionary where each key is a path index, and the value is a list representing the sequence 
-        of labels (K numbers or identifiers) associated with the edges in that path.
-        Example: {0: ['K00001', 'K00003', 'K00004', 'K00005'], 1: ['K00002', 'K00003', 'K00004', 'K00005']}
-    
+        A dictionary mapping each most-complete path index to a list representing the sequence
+        of labels (K numbers or identifiers) associated with the edges in that path.  Only the
+        most-complete paths are materialized; the remaining paths exist solely as backpointers.
+        Example: {1: ['K00002', 'K00003', 'K00004', 'K00005']}
+
     weights_normalized : list of floats
-        A list of normalized weights for each path, where each weight is the ratio of the new 
+        A list of normalized weights for each path, where each weight is the ratio of the new
         to the old weight for that path.
         Example: [1.2, 1.1, 1.3]
 
     most_complete_paths : list of ints
-        A list of indices of the paths that have the smallest normalized weight (metric M), 
+        A list of indices of the paths that have the smallest normalized weight (metric M),
         indicating the most "complete" or optimized paths.
         Example: [1, 2]
 
     Notes
     -----
     - The graph must be a directed acyclic graph (DAG) to ensure proper topological sorting.
-    - The `graph` object is copied internally to avoid modifying the original graph.
+    - Paths are accumulated as per-node numpy weight sums plus backpointers rather than
+      per-path label/node lists, so extending every partial path across an edge is one
+      vectorized add instead of P list concatenations.  Label sequences are reconstructed
+      from the backpointers only for the winning paths.
 
     Example
     -------
@@ -141,84 +503,169 @@ def find_paths_in_pathway_graph(
 
     >>> G = nx.MultiDiGraph()
     >>> # Add nodes and edges with weights
-    >>> paths, path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(G)
-    >>> print(paths)
-    [[0, 2, 4, 5, 6, 7, 1], [0, 3, 5, 7, 1]]
+    >>> path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(G)
     >>> print(path_to_ordered_kos)
-    {0: ['K00001', 'K00003', 'K00004', 'K00005'], 1: ['K00002', 'K00003', 'K00004', 'K00005']}
+    {1: ['K00002', 'K00003', 'K00004', 'K00005']}
     >>> print(weights_normalized)
     [1.2, 1.1]
     >>> print(most_complete_paths)
     [1]
     """
-    # graph = graph.copy()
-    
-    node_paths = {}
-    path_labels = {}
+    # Compiled fast path: when weights come in array form the whole DP runs
+    # as a Numba kernel over CSR incoming-edge arrays (built once per graph
+    # and cached), producing bit-identical records to the loop below
+    if weights_new is not None and _find_paths_csr is not None and not prune_dominated:
+        csr = graph.graph.get("_pathway_csr")
+        if csr is None:
+            csr = build_pathway_csr(graph)
+            graph.graph["_pathway_csr"] = csr
+        record_offsets, record_counts, record_old, record_new, record_back, record_label = _find_paths_csr(
+            csr["topological_order"],
+            csr["in_indptr"],
+            csr["in_sources"],
+            csr["in_edge_indices"],
+            csr["in_label_ids"],
+            weights,
+            weights_new,
+        )
+        sink_offset = record_offsets[1]
+        sink_count = record_counts[1]
+        normalized = (
+            record_new[sink_offset:sink_offset + sink_count]
+            / record_old[sink_offset:sink_offset + sink_count]
+        )
+        weights_normalized = normalized.tolist()
+
+        # C-level min and tie gathering instead of two Python loops
+        most_complete_paths = np.flatnonzero(normalized == normalized.min()).tolist()
+
+        labels = csr["labels"]
+        path_to_ordered_kos = {}
+        for path_index in most_complete_paths:
+            ordered_kos = []
+            record = sink_offset + path_index
+            while record_back[record] != -1:
+                ordered_kos.append(labels[record_label[record]])
+                record = record_back[record]
+            ordered_kos.reverse()
+            path_to_ordered_kos[path_index] = ordered_kos
+
+        return path_to_ordered_kos, weights_normalized, most_complete_paths
+
+    # Per-node parallel records: float64 weight sums plus backpointers
+    # (predecessor node, record index within it, edge label) for reconstruction
     old_weights = {}
     new_weights = {}
-    
-    sorted_nodes = list(nx.topological_sort(graph))
-    for node in sorted_nodes:
-        record_count = 0
-        node_paths[node] = []
-        path_labels[node] = {}
-        old_weights[node] = {}
-        new_weights[node] = {}
+    back_nodes = {}
+    back_records = {}
+    back_labels = {}
 
+    # The graph is immutable after construction, so the O(V+E) sort is paid
+    # once and cached on the graph's attribute dict (like _edge_key_index and
+    # _pathway_csr) rather than recomputed for every genome evaluated.
+    sorted_nodes = graph.graph.get("_topological_order")
+    if sorted_nodes is None:
+        sorted_nodes = list(nx.topological_sort(graph))
+        graph.graph["_topological_order"] = sorted_nodes
+    for node in sorted_nodes:
         predecessors = graph.pred[node]
         if not predecessors:
-            node_paths[node].append([node])
-            path_labels[node][0] = []
-            old_weights[node][0] = 0
-            new_weights[node][0] = 0
+            old_weights[node] = np.zeros(1)
+            new_weights[node] = np.zeros(1)
+            back_nodes[node] = [-1]
+            back_records[node] = np.zeros(1, dtype=np.int32)
+            back_labels[node] = [None]
             continue
 
-        for pred in predecessors.keys():  # pred --> node
-            number_of_paths_from_predecessor = len(path_labels[pred])
+        old_chunks = []
+        new_chunks = []
+        node_back_nodes = []
+        record_chunks = []
+        node_back_labels = []
+
+        # Ascending node order keeps path enumeration (and therefore which of
+        # several tied most-complete paths is reported) identical to the
+        # historical behavior of evaluating a graph.copy(), whose adjacency
+        # is rebuilt grouped by source node
+        for pred in sorted(predecessors):  # pred --> node
+            number_of_paths_from_predecessor = len(old_weights[pred])
+            record_indices = np.arange(number_of_paths_from_predecessor, dtype=np.int32)
 
             for edge_key in predecessors[pred]:
-                # 
+                #
                 #    Handling multiple edges pred---A---->node
-                #                        \____B____/ 
-                for path_index in range(number_of_paths_from_predecessor):
-                    current_labels = path_labels[pred][path_index]
-                    path_labels[node][record_count] = \
-                        current_labels + [predecessors[pred][edge_key]['label']]
-                    old_weights[node][record_count] = \
-                        old_weights[pred][path_index] + predecessors[pred][edge_key]['weight']
-                    new_weights[node][record_count] = \
-                        new_weights[pred][path_index] + predecessors[pred][edge_key]['weight_new']
-                    record_count += 1
-                for current_path in node_paths[pred]:
-                    new_path = current_path + [node]
-                    node_paths[node].append(new_path)
-
-    paths = node_paths[1]
-    path_to_ordered_kos = path_labels[1]
-    old_weights_for_paths = old_weights[1]
-    new_weights_for_paths = new_weights[1]
-
-    weights_normalized = []
-    for i in range(len(old_weights_for_paths)):
-        weights_normalized.append(1.0 * new_weights_for_paths[i] / old_weights_for_paths[i])
-
-    min_weight_normalized = min(weights_normalized)  # Find the minimum metric value
-    most_complete_paths = []  # Initialize an empty list to store indices
-
-    # Iterate through the metrics list to find indices with the minimum metric
-    for i, w in enumerate(weights_normalized):
-        if w == min_weight_normalized:
-            most_complete_paths.append(i)
-
-    return paths, path_to_ordered_kos, weights_normalized, most_complete_paths
+                #                        \____B____/
+                edge_data = predecessors[pred][edge_key]
+                edge_label = edge_data['label']
+                if weights_new is None:
+                    edge_weight = edge_data['weight']
+                    edge_weight_new = edge_data['weight_new']
+                else:
+                    edge_index = edge_data['index']
+                    edge_weight = weights[edge_index]
+                    edge_weight_new = weights_new[edge_index]
+                # One vectorized add extends every partial path ending at pred
+                old_chunks.append(old_weights[pred] + edge_weight)
+                new_chunks.append(new_weights[pred] + edge_weight_new)
+                node_back_nodes.extend([pred] * number_of_paths_from_predecessor)
+                record_chunks.append(record_indices)
+                node_back_labels.extend([edge_label] * number_of_paths_from_predecessor)
+
+        old_weights[node] = np.concatenate(old_chunks) if len(old_chunks) > 1 else old_chunks[0]
+        new_weights[node] = np.concatenate(new_chunks) if len(new_chunks) > 1 else new_chunks[0]
+        back_nodes[node] = node_back_nodes
+        back_records[node] = np.concatenate(record_chunks) if len(record_chunks) > 1 else record_chunks[0]
+        back_labels[node] = node_back_labels
+
+        if prune_dominated and node != 1 and len(node_back_nodes) > 1:
+            # Pareto sweep: sort by old-weight sum ascending (stable, so the
+            # first-enumerated record survives among equals) and keep only
+            # records whose new-weight sum strictly improves on everything
+            # with a smaller-or-equal old-weight sum
+            order = np.argsort(old_weights[node], kind="stable")
+            survivors = []
+            best_new = np.inf
+            for record in order:
+                if new_weights[node][record] < best_new:
+                    survivors.append(record)
+                    best_new = new_weights[node][record]
+            if len(survivors) < len(node_back_nodes):
+                survivors = np.asarray(survivors, dtype=np.int64)
+                old_weights[node] = old_weights[node][survivors]
+                new_weights[node] = new_weights[node][survivors]
+                back_records[node] = back_records[node][survivors]
+                back_nodes[node] = [node_back_nodes[record] for record in survivors]
+                back_labels[node] = [node_back_labels[record] for record in survivors]
+
+    normalized = new_weights[1] / old_weights[1]
+    weights_normalized = normalized.tolist()
+
+    # C-level min and tie gathering instead of two Python loops
+    most_complete_paths = np.flatnonzero(normalized == normalized.min()).tolist()
+
+    # Walk the backpointers sink -> source to materialize the label sequence
+    # for the winning paths only
+    path_to_ordered_kos = {}
+    for path_index in most_complete_paths:
+        ordered_kos = []
+        node = 1
+        record = path_index
+        while back_nodes[node][record] != -1:
+            ordered_kos.append(back_labels[node][record])
+            node, record = back_nodes[node][record], back_records[node][record]
+        ordered_kos.reverse()
+        path_to_ordered_kos[path_index] = ordered_kos
+
+    return path_to_ordered_kos, weights_normalized, most_complete_paths
 
 
 def get_pathway_coverage(
     evaluation_kos: set, 
-    graph: nx.MultiDiGraph, 
-    ko_to_nodes: dict, 
+    graph: nx.MultiDiGraph,
+    ko_to_nodes: dict,
     optional_kos: set,
+    edges_soa: dict = None,
+    weights_new_buffer: np.ndarray = None,
 ):
     """
     Calculate the coverage of a pathway graph based on a given set of KOs (KEGG Orthology terms).
@@ -245,6 +692,17 @@ def get_pathway_coverage(
     optional_kos : set
         A set of KOs that are optional and not required for full pathway coverage.
 
+    edges_soa : dict, optional
+        Structure-of-arrays edge data produced by `build_edges_soa`.  When
+        provided, the detected-KO weight update is a numpy scatter and the
+        path search reads weights from the arrays, avoiding the per-call
+        graph copy entirely.
+
+    weights_new_buffer : np.ndarray, optional
+        A scratch array reused for the updated weights (see
+        `update_soa_edge_weights_with_detected_kos`).  Only meaningful with
+        `edges_soa`.
+
     Returns
     -------
     dict
@@ -259,11 +717,21 @@ def get_pathway_coverage(
     - The function modifies a copy of the input graph, leaving the original graph unchanged.
     - The function assumes that the graph is directed and acyclic, suitable for pathway analysis.
     """
-    # Updates the edge weights in the given directed graph based on the presence of KOs in the evaluation set.
-    graph_weighted = update_graph_edge_weights_with_detected_kos(evaluation_kos, graph, ko_to_nodes)
-    
-    # Find the best path(s) based on the updated graph
-    paths, path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(graph_weighted)
+    if edges_soa is not None:
+        # Scatter detected KOs into the weight array; no graph copy needed
+        weights_new = update_soa_edge_weights_with_detected_kos(evaluation_kos, edges_soa, out=weights_new_buffer)
+        path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(
+            graph, weights=edges_soa["edges_weight"], weights_new=weights_new,
+        )
+    else:
+        # Zero the detected KOs' edge weights in place, evaluate, then restore;
+        # much cheaper than deep-copying the graph per evaluation
+        graph_weighted, touched_edges = update_graph_edge_weights_with_detected_kos(evaluation_kos, graph, ko_to_nodes)
+        try:
+            # Find the best path(s) based on the updated graph
+            path_to_ordered_kos, weights_normalized, most_complete_paths = find_paths_in_pathway_graph(graph_weighted)
+        finally:
+            restore_graph_edge_weights(graph_weighted, touched_edges)
 
     # Select the first of the most complete paths (all have the same coverage)
     most_complete_path = most_complete_paths[0]
@@ -287,10 +755,188 @@ def get_pathway_coverage(
         required_kos_missing_in_path=required_kos_missing_in_path,
     )
 
+def build_ko_to_bit(database: dict) -> dict:
+    """
+    Intern every KO in the database to a bit in a shared bitmask space.
+
+    KO identifiers are 6-character strings; any set algebra over them pays
+    string hashing per element.  Assigning each distinct KO a bit (in
+    database iteration order, so the mapping is deterministic) lets callers
+    encode KO sets as Python big-int masks where intersection, difference,
+    and overlap counting collapse to single bitwise operations.
+
+    Parameters
+    ----------
+    database : dict
+        A dictionary representing the KEGG database, where each value
+        contains a "ko_to_nodes" mapping (see `pathway_coverage_wrapper`).
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each KO identifier to its bit (1 << position).
+    """
+    ko_to_bit = dict()
+    for data in database.values():
+        for id_ko in data["ko_to_nodes"]:
+            if id_ko not in ko_to_bit:
+                ko_to_bit[id_ko] = 1 << len(ko_to_bit)
+    return ko_to_bit
+
+
+def build_genome_mask(evaluation_kos: set, ko_to_bit: dict) -> int:
+    """
+    Encode an evaluation KO set as a bitmask over the interned database KOs.
+
+    KOs absent from the database are simply not represented; they cannot
+    contribute to any pathway anyway.
+
+    Parameters
+    ----------
+    evaluation_kos : set
+        A set of KEGG Orthology (KO) identifiers.
+
+    ko_to_bit : dict
+        The KO -> bit table from `build_ko_to_bit`.
+
+    Returns
+    -------
+    int
+        The bitwise OR of the bits of every recognized KO.
+    """
+    genome_mask = 0
+    for id_ko in evaluation_kos:
+        bit = ko_to_bit.get(id_ko)
+        if bit is not None:
+            genome_mask |= bit
+    return genome_mask
+
+
+def _get_pathway_kos(data: dict) -> frozenset:
+    """
+    Return the cached frozenset of a database entry's KOs, building it on first use.
+
+    The disjointness gates run once per genome per pathway; a cached frozenset
+    lets set operations pick the cheaper side to iterate instead of rehashing
+    the ko_to_nodes keys every call.
+    """
+    pathway_kos = data.get("pathway_kos")
+    if pathway_kos is None:
+        pathway_kos = frozenset(data["ko_to_nodes"])
+        data["pathway_kos"] = pathway_kos
+    return pathway_kos
+
+
+def _get_pathway_mask(data: dict, ko_to_bit: dict) -> int:
+    """
+    Return the cached bitmask of a database entry's KOs, building it on first use.
+
+    With the genome encoded the same way, the per-pathway overlap gate is a
+    single big-int AND instead of a hashed set intersection.  The mask is
+    deterministic across calls because `build_ko_to_bit` assigns bits in
+    database order.
+    """
+    pathway_mask = data.get("ko_mask")
+    if pathway_mask is None:
+        pathway_mask = 0
+        for id_ko in data["ko_to_nodes"]:
+            pathway_mask |= ko_to_bit[id_ko]
+        data["ko_mask"] = pathway_mask
+    return pathway_mask
+
+
+def _get_cached_pathway_coverage(
+    data: dict,
+    evaluation_kos: set,
+    overlap_mask: int,
+    weights_new_buffer: np.ndarray = None,
+    ) -> dict:
+    """
+    Evaluate a database entry's coverage with memoization on the KO overlap.
+
+    The path DP depends only on which of the pathway's KOs are detected, so
+    results are cached on the entry keyed by the overlap bitmask
+    (genome mask AND pathway mask): genomes hitting a pathway with the same
+    KO subset share one evaluation.  The lone genome-dependent output,
+    'required_kos_missing_in_path', also counts evaluation KOs outside the
+    pathway, so cache hits rebuild it from the cached path before returning.
+
+    Parameters
+    ----------
+    data : dict
+        The database entry ("graph", "ko_to_nodes", "optional_kos", caches).
+
+    evaluation_kos : set
+        A set of KEGG Orthology (KO) identifiers detected in the genome.
+
+    overlap_mask : int
+        The nonzero AND of the genome's and the pathway's bitmasks
+        (see `build_genome_mask` / `_get_pathway_mask`).
+
+    weights_new_buffer : np.ndarray, optional
+        Scratch array forwarded to `get_pathway_coverage` on cache misses.
+
+    Returns
+    -------
+    dict
+        The same result dictionary as `get_pathway_coverage`.
+    """
+    cache = data.get("coverage_cache")
+    if cache is None:
+        cache = data["coverage_cache"] = dict()
+    cached = cache.get(overlap_mask)
+    if cached is None:
+        edges_soa = data.get("edges_soa")
+        if edges_soa is None:
+            # Databases built before the SoA layout lack "edges_soa"; build it
+            # on first use so every evaluation takes the array path
+            edges_soa = data["edges_soa"] = build_edges_soa(data["graph"], data["ko_to_nodes"])
+        cached = get_pathway_coverage(
+            evaluation_kos=evaluation_kos,
+            graph=data["graph"],
+            ko_to_nodes=data["ko_to_nodes"],
+            optional_kos=data["optional_kos"],
+            edges_soa=edges_soa,
+            weights_new_buffer=weights_new_buffer,
+        )
+        cache[overlap_mask] = cached
+        return cached
+
+    results = dict(cached)
+    if results["coverage"] > 0:
+        kos_in_path = set(results["most_complete_path"])
+        results["required_kos_missing_in_path"] = (evaluation_kos - kos_in_path) - data["optional_kos"]
+    return results
+
+
+# Worker-process globals for pathway_coverage_wrapper(n_jobs > 1); set once
+# per worker by the pool initializer so tasks only carry pathway identifiers
+_WORKER_DATABASE = None
+_WORKER_EVALUATION_KOS = None
+_WORKER_KO_TO_BIT = None
+_WORKER_GENOME_MASK = None
+
+def _initialize_coverage_worker(database, evaluation_kos):
+    global _WORKER_DATABASE, _WORKER_EVALUATION_KOS, _WORKER_KO_TO_BIT, _WORKER_GENOME_MASK
+    _WORKER_DATABASE = database
+    _WORKER_EVALUATION_KOS = evaluation_kos
+    _WORKER_KO_TO_BIT = build_ko_to_bit(database)
+    _WORKER_GENOME_MASK = build_genome_mask(evaluation_kos, _WORKER_KO_TO_BIT)
+
+def _evaluate_pathway_coverage(id_pathway):
+    data = _WORKER_DATABASE[id_pathway]
+    overlap_mask = _WORKER_GENOME_MASK & _get_pathway_mask(data, _WORKER_KO_TO_BIT)
+    if not overlap_mask:
+        return id_pathway, None
+    return id_pathway, _get_cached_pathway_coverage(data, _WORKER_EVALUATION_KOS, overlap_mask)
+
+
 def pathway_coverage_wrapper(
     evaluation_kos: set,
     database: dict,
     progressbar_description: str = "Calculating pathway coverage:",
+    ko_to_pathways: dict = None,
+    n_jobs: int = 1,
 ) -> dict:
     """
     Calculates the coverage of pathways in a KEGG database based on a set of evaluation KOs (KEGG Orthology identifiers).
@@ -313,11 +959,21 @@ def pathway_coverage_wrapper(
     
     progressbar_description : str, optional
         A string to describe the progress bar shown during the calculation, by default "Calculating pathway coverage:".
-        
+
+    ko_to_pathways : dict, optional
+        An inverted KO -> pathways index from `build_ko_to_pathways`.  When
+        provided, only the pathways containing at least one evaluation KO are
+        visited instead of testing every pathway in the database for overlap.
+
+    n_jobs : int, optional
+        Number of worker processes for evaluating pathways in parallel; each
+        pathway is an independent, read-only evaluation.  Use -1 for all
+        available cores.  [Default: 1]
+
     Returns:
     -------
     dict
-        A dictionary where each key is a pathway identifier, and the value is the result of the `get_pathway_coverage` 
+        A dictionary where each key is a pathway identifier, and the value is the result of the `get_pathway_coverage`
         function, which includes coverage statistics and other relevant information.
     
     Example:
@@ -340,30 +996,152 @@ def pathway_coverage_wrapper(
     """
     
     pathway_to_results = dict()  # Dictionary to store coverage results for each pathway
-    
-    # Iterate over each pathway in the database
-    for id_pathway in tqdm(database, desc=progressbar_description, unit=" Pathways"):
-        # Extract the graph, KO-to-nodes mapping, and optional KOs for the current pathway
-        graph = database[id_pathway]["graph"]
-        ko_to_nodes = database[id_pathway]["ko_to_nodes"]
-        optional_kos = database[id_pathway]["optional_kos"]
-        
-        # Find the intersection of evaluation KOs and the KOs present in the pathway
-        intersecting_kos = set(ko_to_nodes) & evaluation_kos
-        
-        # If there are intersecting KOs, calculate pathway coverage
-        if intersecting_kos:
-            results = get_pathway_coverage(
-                evaluation_kos=evaluation_kos,
-                graph=graph, 
-                ko_to_nodes=ko_to_nodes, 
-                optional_kos=optional_kos,
+
+    if ko_to_pathways is not None:
+        # Derive candidate pathways from the inverted index, preserving
+        # database order so results are deterministic
+        candidate_pathways = set()
+        for id_ko in evaluation_kos:
+            if id_ko in ko_to_pathways:
+                candidate_pathways.update(ko_to_pathways[id_ko])
+        pathway_iterable = [id_pathway for id_pathway in database if id_pathway in candidate_pathways]
+    else:
+        pathway_iterable = database
+
+    # Encode the genome as a bitmask so the per-pathway overlap gate below is
+    # one big-int AND against each pathway's cached mask
+    ko_to_bit = build_ko_to_bit(database)
+    genome_mask = build_genome_mask(evaluation_kos, ko_to_bit)
+
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    number_of_pathways = len(pathway_iterable)
+    if n_jobs > 1 and number_of_pathways > 1:
+        n_jobs = min(n_jobs, number_of_pathways)
+        # Fork shares the database with workers copy-on-write where available;
+        # otherwise the initializer pickles it once per worker, not per task
+        start_methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in start_methods else None)
+        chunksize = max(1, number_of_pathways // (4 * n_jobs))
+        unordered_results = dict()
+        with context.Pool(
+            processes=n_jobs,
+            initializer=_initialize_coverage_worker,
+            initargs=(database, evaluation_kos),
+        ) as pool:
+            for id_pathway, results in tqdm(
+                pool.imap_unordered(_evaluate_pathway_coverage, pathway_iterable, chunksize=chunksize),
+                desc=progressbar_description,
+                unit=" Pathways",
+                mininterval=1.0,
+                total=number_of_pathways,
+            ):
+                if results is not None:
+                    unordered_results[id_pathway] = results
+        # Reassemble in database order so output matches the serial loop
+        for id_pathway in pathway_iterable:
+            if id_pathway in unordered_results:
+                pathway_to_results[id_pathway] = unordered_results[id_pathway]
+        return pathway_to_results
+
+    # Iterate over each pathway with at least one evaluation KO
+    for id_pathway in tqdm(
+        pathway_iterable,
+        desc=progressbar_description,
+        unit=" Pathways",
+        mininterval=1.0,
+        # Bound refresh count: pathway iterations are microseconds when the
+        # genome misses, so per-iteration terminal writes would dominate
+        miniters=max(1, number_of_pathways // 200),
+    ):
+        # If there are intersecting KOs, calculate pathway coverage; results
+        # are memoized per entry on the overlap mask, so genomes hitting the
+        # pathway with the same KO subset share one DP evaluation
+        overlap_mask = genome_mask & _get_pathway_mask(database[id_pathway], ko_to_bit)
+        if overlap_mask:
+            pathway_to_results[id_pathway] = _get_cached_pathway_coverage(
+                database[id_pathway], evaluation_kos, overlap_mask,
             )
-            pathway_to_results[id_pathway] = results  # Store the results in the dictionary
     
     return pathway_to_results
 
 
+def multiple_genome_pathway_coverage_wrapper(
+    genome_to_kos: dict,
+    database: dict,
+    progressbar_description: str = "Calculating pathway coverage:",
+) -> dict:
+    """
+    Calculates pathway coverage for multiple genomes in a single pass over the database.
+
+    Where `pathway_coverage_wrapper` walks every pathway once per genome, this
+    wrapper inverts the loops: each pathway's graph and KO mappings are pulled
+    into cache once and evaluated against every genome's KO set before moving
+    to the next pathway.  With many genomes this reuses the pathway data while
+    it is hot instead of cycling the whole database through cache per genome.
+
+    Parameters:
+    ----------
+    genome_to_kos : dict
+        A dictionary mapping each genome identifier to its set of KEGG Orthology (KO) identifiers.
+
+    database : dict
+        A dictionary representing the KEGG database as produced by `build-pathway-database.py`,
+        where each key is a pathway identifier and the value contains "graph", "ko_to_nodes",
+        and "optional_kos" (see `pathway_coverage_wrapper`).
+
+    progressbar_description : str, optional
+        A string to describe the progress bar shown during the calculation, by default "Calculating pathway coverage:".
+
+    Returns:
+    -------
+    dict
+        A dictionary mapping each genome identifier to a {id_pathway: results} dictionary
+        with the same per-pathway results as `get_pathway_coverage`.  Pathways with no
+        intersecting KOs for a genome are omitted, matching `pathway_coverage_wrapper`.
+    """
+    genome_to_results = {id_genome: dict() for id_genome in genome_to_kos}
+
+    # Encode every genome as a bitmask once so the inner overlap gate is one
+    # big-int AND per (pathway, genome) pair
+    ko_to_bit = build_ko_to_bit(database)
+    genome_to_mask = {
+        id_genome: build_genome_mask(evaluation_kos, ko_to_bit)
+        for id_genome, evaluation_kos in genome_to_kos.items()
+    }
+
+    # Iterate over each pathway in the database once
+    for id_pathway in tqdm(
+        database,
+        desc=progressbar_description,
+        unit=" Pathways",
+        mininterval=1.0,
+        miniters=max(1, len(database) // 200),
+    ):
+        edges_soa = database[id_pathway].get("edges_soa")
+        if edges_soa is None:
+            # Older databases lack the SoA layout; build and cache it so the
+            # hot path traverses arrays rather than nested edge dicts
+            edges_soa = build_edges_soa(database[id_pathway]["graph"], database[id_pathway]["ko_to_nodes"])
+            database[id_pathway]["edges_soa"] = edges_soa
+        pathway_mask = _get_pathway_mask(database[id_pathway], ko_to_bit)
+
+        # One scratch weight array per pathway, reset per genome by memcpy
+        weights_new_buffer = np.empty_like(edges_soa["edges_weight"])
+
+        # Evaluate every genome against the current pathway while its data is
+        # hot; identical KO overlaps collapse to one cached DP evaluation
+        for id_genome, evaluation_kos in genome_to_kos.items():
+            overlap_mask = genome_to_mask[id_genome] & pathway_mask
+            if overlap_mask:
+                genome_to_results[id_genome][id_pathway] = _get_cached_pathway_coverage(
+                    database[id_pathway], evaluation_kos, overlap_mask,
+                    weights_new_buffer=weights_new_buffer,
+                )
+
+    return genome_to_results
+
+
 # @dataclass
 class Pathway:
     """
@@ -414,6 +1192,9 @@ class Pathway:
             weight=1
         )
         self.kos_ = set(self.ko_to_nodes_)
+
+        # Flatten edge data into contiguous arrays for fast coverage evaluation
+        self.edges_soa_ = build_edges_soa(self.graph_, self.ko_to_nodes_)
         
     # Evaluate pathway coverage from set of KOs
 
@@ -438,9 +1219,10 @@ class Pathway:
         check_argument_choice(return_type, choices)
         results = get_pathway_coverage(
             evaluation_kos=kos,
-            graph=self.graph_, 
-            ko_to_nodes=self.ko_to_nodes_, 
+            graph=self.graph_,
+            ko_to_nodes=self.ko_to_nodes_,
             optional_kos=self.optional_kos_,
+            edges_soa=self.edges_soa_,
         )
 
         if return_type:
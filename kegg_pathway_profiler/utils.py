@@ -1,83 +1,432 @@
 #!/usr/bin/env python
-from collections import defaultdict
-from pyexeggutor import open_file_reader
+import bz2
+import io
+import mmap
+import os
+import pickle
+import pickletools
+import pandas as pd
+
+# python-isal is an API-compatible gzip replacement whose SIMD-accelerated
+# inflate/deflate (ISA-L) decompresses 2-5x faster than the stdlib; fall back
+# to the stdlib when it is not installed (pip install kegg_pathway_profiler[fast])
+try:
+    from isal import igzip as gzip
+    _GZIP_BACKEND_IS_ISAL = True
+except ImportError:
+    import gzip
+    _GZIP_BACKEND_IS_ISAL = False
+
+# Buffer size for compressed file streams.  The 8 KiB default of gzip/bz2
+# file objects causes many small reads with per-chunk decompressor dispatch;
+# 128 KiB amortizes that overhead for line-oriented callers like `read_kos`.
+READ_BUFFER_SIZE = 128 * 1024
+
+
+def _infer_compression(filepath: str):
+    """Infer the compression type from a filepath extension (or None)."""
+    extension = str(filepath).split(".")[-1].lower()
+    if extension == "gz":
+        return "gzip"
+    if extension == "bz2":
+        return "bz2"
+    if extension in {"zst", "zstd"}:
+        return "zstd"
+    return None
+
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_BZ2_MAGIC = b"BZh"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _sniff_compression(filepath: str):
+    """
+    Detect the compression type from a file's magic bytes (or None).
+
+    More reliable than the extension for reads: a gzipped table named
+    `.backup` or a plain file named `.gz` both route to the right decoder.
+    Falls back to the extension if the file cannot be peeked.
+    """
+    try:
+        with open(filepath, "rb") as f:
+            header = f.read(4)
+    except OSError:
+        return _infer_compression(filepath)
+    if header.startswith(_GZIP_MAGIC):
+        return "gzip"
+    if header.startswith(_BZ2_MAGIC):
+        return "bz2"
+    if header.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return None
+
+
+def open_file_reader(filepath: str, compression="auto", binary=False):
+    """
+    Open a file for reading with optional compression and large read buffers.
+
+    Drop-in replacement for `pyexeggutor.open_file_reader` that wraps the
+    decompression stream in an `io.BufferedReader` with a 128 KiB buffer, so
+    line-oriented consumers issue a few large reads into the decompressor
+    instead of thousands of small ones.  With the default "auto", the
+    compression type is detected from the file's magic bytes rather than its
+    extension, so mislabeled files still route to the right decoder.
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file.
+
+    compression : str, optional
+        One of {None, "gzip", "bz2", "zstd"}, or "auto" to detect from the
+        file's magic bytes. [Default: "auto"]
+
+    binary : bool, optional
+        Whether to open the file in binary mode. [Default: False]
+
+    Returns
+    -------
+    file object
+        A file-like object.
+    """
+    if compression == "auto":
+        compression = _sniff_compression(filepath)
+
+    if not compression:
+        return open(filepath, "rb" if binary else "rt")
+    if compression == "gzip":
+        stream = gzip.open(filepath, "rb")
+    elif compression == "bz2":
+        stream = bz2.open(filepath, "rb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading Zstandard-compressed files requires the `zstandard` package (pip install zstandard)")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(filepath, "rb"))
+    else:
+        raise ValueError(f"Unsupported compression type: {compression}")
+
+    buffered = io.BufferedReader(stream, buffer_size=READ_BUFFER_SIZE)
+    return buffered if binary else io.TextIOWrapper(buffered)
+
+
+def open_file_writer(filepath: str, compression="auto", binary=False):
+    """
+    Open a file for writing with optional compression and large write buffers.
+
+    Drop-in replacement for `pyexeggutor.open_file_writer`; see
+    `open_file_reader` for the buffering rationale.  Compression is inferred
+    from the extension (the file does not exist yet, so there are no magic
+    bytes to sniff).
+
+    Parameters
+    ----------
+    filepath : str
+        Path to the file.
+
+    compression : str, optional
+        One of {None, "gzip", "bz2", "zstd"}, or "auto" to infer from the
+        extension. [Default: "auto"]
+
+    binary : bool, optional
+        Whether to open the file in binary mode. [Default: False]
+
+    Returns
+    -------
+    file object
+        A file-like object.
+    """
+    if compression == "auto":
+        compression = _infer_compression(filepath)
+
+    if not compression:
+        return open(filepath, "wb" if binary else "wt")
+    if compression == "gzip":
+        if _GZIP_BACKEND_IS_ISAL:
+            # isal levels run 0-3; level 1 compresses several times faster
+            # than stdlib gzip's default at a comparable ratio
+            stream = gzip.open(filepath, "wb", compresslevel=1)
+        else:
+            stream = gzip.open(filepath, "wb")
+    elif compression == "bz2":
+        stream = bz2.open(filepath, "wb")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Writing Zstandard-compressed files requires the `zstandard` package (pip install zstandard)")
+        # write_return_read makes write() report bytes consumed, which is
+        # what io.BufferedWriter expects of the stream beneath it
+        stream = zstandard.ZstdCompressor(threads=-1).stream_writer(
+            open(filepath, "wb"), write_return_read=True,
+        )
+    else:
+        raise ValueError(f"Unsupported compression type: {compression}")
+
+    buffered = io.BufferedWriter(stream, buffer_size=READ_BUFFER_SIZE)
+    return buffered if binary else io.TextIOWrapper(buffered)
+
+
+# pickletools.optimize scans the stream twice; skip it for very large pickles
+# where the rescan would dominate the saved bytes
+_PICKLE_OPTIMIZE_THRESHOLD = 50 << 20
+
+
+def _serialize_pickle(obj) -> bytes:
+    """
+    Serialize an object with the highest pickle protocol and prune dead opcodes.
+
+    `pickletools.optimize` drops PUT/MEMOIZE entries that are never referenced,
+    shrinking the stream (and therefore compression and load time) by 10-30%
+    for dict-heavy objects like the pathway database.
+    """
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) < _PICKLE_OPTIMIZE_THRESHOLD:
+        data = pickletools.optimize(data)
+    return data
+
+
+def write_pickle(obj, filepath: str, compression_level: int = 3):
+    """
+    Serialize an object to a pickle file, choosing the compressor from the file extension.
+
+    Files ending in `.zst`/`.zstd` are compressed with Zstandard, which decompresses
+    3-5x faster than gzip at a similar ratio.  All other extensions (e.g., `.pkl.gz`,
+    `.pkl`) are written through `open_file_writer`, so gzip output uses the
+    isal backend when installed.
+
+    Parameters
+    ----------
+    obj : object
+        The object to serialize.
+
+    filepath : str
+        The path to the output pickle file.
+
+    compression_level : int, optional
+        Zstandard compression level used for `.zst`/`.zstd` files. [Default: 3]
+
+    Raises
+    ------
+    ImportError
+        If a `.zst`/`.zstd` filepath is provided but `zstandard` is not installed.
+    """
+    data = _serialize_pickle(obj)
+    if str(filepath).endswith((".zst", ".zstd")):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Writing .zst/.zstd pickles requires the `zstandard` package (pip install zstandard)")
+        with open(filepath, "wb") as f:
+            # threads=-1 compresses with all available cores
+            with zstandard.ZstdCompressor(level=compression_level, threads=-1).stream_writer(f) as writer:
+                writer.write(data)
+    else:
+        with open_file_writer(filepath, binary=True) as f:
+            f.write(data)
+
+
+# Cache for memoized read_pickle calls keyed by (realpath, mtime)
+_read_pickle_cache = dict()
+
+def read_pickle(filepath: str, memoize: bool = False):
+    """
+    Deserialize an object from a pickle file, choosing the decompressor from the file extension.
+
+    Files ending in `.zst`/`.zstd` are decompressed with Zstandard.  All other
+    extensions (e.g., `.pkl.gz`, `.pkl`) are read through `open_file_reader`,
+    so gzip input uses the isal backend when installed.
+
+    Parameters
+    ----------
+    filepath : str
+        The path to the input pickle file.
+
+    memoize : bool, optional
+        If True, cache the deserialized object keyed by (realpath, mtime) so
+        repeated loads of the same database (e.g., a driver script processing
+        many genomes) pay the decompression cost once.  The cached object is
+        shared, so callers must not mutate it. [Default: False]
+
+    Returns
+    -------
+    object
+        The deserialized object.
+
+    Raises
+    ------
+    ImportError
+        If a `.zst`/`.zstd` filepath is provided but `zstandard` is not installed.
+    """
+    if memoize:
+        cache_key = (os.path.realpath(filepath), os.path.getmtime(filepath))
+        if cache_key in _read_pickle_cache:
+            return _read_pickle_cache[cache_key]
+
+    if str(filepath).endswith((".zst", ".zstd")):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Reading .zst/.zstd pickles requires the `zstandard` package (pip install zstandard)")
+        with open(filepath, "rb") as f:
+            with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+                obj = pickle.load(reader)
+    elif _sniff_compression(filepath) is None and os.path.getsize(filepath) > 0:
+        # Uncompressed pickles are memory-mapped: pages fault in lazily and
+        # are shared through the OS page cache when several processes load
+        # the same database, instead of each reading a private copy
+        with open(filepath, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                obj = pickle.loads(mm)
+    else:
+        with open_file_reader(filepath, binary=True) as f:
+            obj = pickle.load(f)
+
+    if memoize:
+        _read_pickle_cache[cache_key] = obj
+    return obj
+
+
+def get_database_sidecar_filepath(database_filepath: str, suffix: str) -> str:
+    """
+    Derive the path of a sidecar file written next to the pathway database.
+
+    Strips a trailing compression extension (`.gz`, `.zst`, `.zstd`) and pickle
+    extension (`.pkl`, `.pickle`) from the database path, then appends `suffix`.
+    For example, `database.pkl.gz` with suffix `.version` becomes `database.version`.
+
+    Parameters
+    ----------
+    database_filepath : str
+        The path to the database pickle file.
+
+    suffix : str
+        The sidecar extension to append (e.g., ".version", ".tsv", ".kos").
+
+    Returns
+    -------
+    str
+        The sidecar filepath.
+    """
+    filepath = str(database_filepath)
+    for compression_extension in (".gz", ".zst", ".zstd"):
+        if filepath.endswith(compression_extension):
+            filepath = filepath[:-len(compression_extension)]
+            break
+    for pickle_extension in (".pkl", ".pickle"):
+        if filepath.endswith(pickle_extension):
+            filepath = filepath[:-len(pickle_extension)]
+            break
+    if filepath.endswith("."):
+        filepath = filepath[:-1]
+    return filepath + suffix
+
+
+def write_dataframe_to_tsv(df, filepath: str):
+    """
+    Write a DataFrame (index included) to a TSV file, optionally gzip-compressed.
+
+    When `pyarrow` is installed, the table is serialized with pyarrow's C++ CSV
+    writer which is considerably faster than `DataFrame.to_csv` for large
+    genome x pathway tables.  Without `pyarrow`, this falls back to pandas.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The DataFrame to write.  The index is written as the first column.
+
+    filepath : str
+        The path to the output TSV file.  Paths ending in `.gz` are gzip-compressed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pyarrow_csv
+    except ImportError:
+        df.to_csv(filepath, sep="\t")
+        return
+
+    table = pa.Table.from_pandas(df.reset_index())
+    write_options = pyarrow_csv.WriteOptions(delimiter="\t")
+    if str(filepath).endswith(".gz"):
+        with pa.CompressedOutputStream(str(filepath), "gzip") as stream:
+            pyarrow_csv.write_csv(table, stream, write_options)
+    else:
+        pyarrow_csv.write_csv(table, str(filepath), write_options)
+
 
 def read_kos(filepath: str, name: str):
     """
     Reads KEGG Orthology (KO) identifiers from a file and maps them to corresponding genomes.
 
-    This function processes a file containing KO identifiers, either for a single genome or multiple genomes.
-    The file can either have one KO per line or be a tab-separated table with two columns: 
-    [id_genome] <tab> [id_ko]. It returns a dictionary mapping genome identifiers to sets of KO identifiers.
+    This function reads a file containing KO identifiers, either for a single genome or multiple genomes.
+    The file can either have one KO per line or be a tab-separated table with two columns:
+    [id_genome] <tab> [id_ko]. It returns a dictionary mapping genome identifiers to frozensets of KO identifiers.
+    Tokenization and validation run through pandas' C parser and vectorized
+    string operations, so multi-million-row tables avoid per-line Python work.
 
     Parameters
     ----------
     filepath : str
         The path to the input file containing KO identifiers.
-    
+
     name : str
         The identifier for the genome if the file contains KOs for a single genome.
 
     Returns
     -------
     genome_to_kos : dict
-        A dictionary where keys are genome identifiers and values are sets of KO identifiers.
-    
+        A dictionary where keys are genome identifiers and values are frozensets of KO identifiers.
+        Frozen so callers can key caches or deduplicate profiles without copying.
+        Genomes appear in first-occurrence order.
+
     Raises
     ------
     IndexError
         If the input file has a number of columns that is not 1 or 2.
-    
+
     ValueError
         If any KO identifier in the file is not 6 characters long or does not start with 'K'.
-    
+
     Notes
     -----
     - The function assumes that the input file has no header.
     - The function checks the format of KO identifiers and raises an error if they do not conform to the expected format.
     """
-    
-    # Initialize a dictionary to store genome-to-KO mappings
-    genome_to_kos = defaultdict(set)
-    
+    # Read the first line to determine the number of columns
     with open_file_reader(filepath) as f:
-        # Read the first line and determine the number of columns
         first_line = next(f).strip()
-        fields = first_line.split("\t")
-        number_of_fields = len(fields)
-        
-        # Check for the correct number of columns
-        if number_of_fields not in {1, 2}:
-            raise IndexError(
-                f"Input file must have either 1 KO per line or a tab-separated table with 2 columns: "
-                f"[id_genome] <tab> [id_ko]. No header expected. Current table contains {number_of_fields} columns."
-            )
-        
-        # Case 1: Single genome (1 column per line)
-        if number_of_fields == 1:
-            if name is None:
-                raise ValueError("If --kos are a single column of KOs then --name must be provided")   
-            genome_to_kos[name].add(first_line)
-            for line in f:
-                line = line.strip()
-                if line:
-                    genome_to_kos[name].add(line)
-                    
-        # Case 2: Multiple genomes (2 columns per line)
-        elif number_of_fields == 2:
-            id_genome, id_ko = fields
-            genome_to_kos[id_genome].add(id_ko)
-            for line in f:
-                line = line.strip()
-                if line:
-                    id_genome, id_ko = line.split("\t")
-                    genome_to_kos[id_genome].add(id_ko)
-                    
-    # Validate KO identifiers: ensure they are 6 characters long and start with 'K'
-    for id_ko in set.union(*genome_to_kos.values()):
-        if len(id_ko) != 6 or not id_ko.startswith("K"):
-            raise ValueError("Each KO should be 6 characters long and start with 'K'.")
-    
-    return genome_to_kos
+    number_of_fields = len(first_line.split("\t"))
+
+    # Check for the correct number of columns
+    if number_of_fields not in {1, 2}:
+        raise IndexError(
+            f"Input file must have either 1 KO per line or a tab-separated table with 2 columns: "
+            f"[id_genome] <tab> [id_ko]. No header expected. Current table contains {number_of_fields} columns."
+        )
+
+    if number_of_fields == 1 and name is None:
+        raise ValueError("If --kos are a single column of KOs then --name must be provided")
+
+    # C-engine tokenization; na_filter=False keeps every field a raw string
+    df = pd.read_csv(filepath, sep="\t", header=None, dtype=str, na_filter=False, engine="c")
+
+    # Mirror the per-line strip of the streaming parser (stray spaces, \r)
+    kos = df.iloc[:, -1].str.strip()
+
+    # Validate KO identifiers (6 characters, 'K' prefix) with vectorized
+    # string operations instead of a per-KO Python loop
+    if not (kos.str.len().eq(6) & kos.str.startswith("K")).all():
+        raise ValueError("Each KO should be 6 characters long and start with 'K'.")
+
+    # Case 1: Single genome (1 column per line)
+    if number_of_fields == 1:
+        return {name: frozenset(kos)}
+
+    # Case 2: Multiple genomes (2 columns per line); sort=False preserves
+    # first-occurrence genome order
+    genomes = df.iloc[:, 0].str.strip()
+    return {id_genome: frozenset(genome_kos) for id_genome, genome_kos in kos.groupby(genomes, sort=False)}
 
  
\ No newline at end of file
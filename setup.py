@@ -38,6 +38,11 @@ setup(
     #     'kegg_pathway_profiler': ['data/database.pkl.gz'],  # Specify the data file to include
     # },
     install_requires=requirements,
+    extras_require={
+        # Optional accelerators: SIMD gzip, JIT path traversal, fast TSV
+        # writing, and Zstandard pickle compression
+        "fast": ["isal", "numba", "orjson", "pyarrow", "zstandard"],
+    },
     scripts=[
         "bin/profile-pathway-coverage.py",
         "bin/build-pathway-database.py",